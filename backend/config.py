@@ -12,6 +12,7 @@ class Settings:
     INDEX_DIR = os.path.join(BASE_DIR, "indexing_storage")
     INDEX_FILE = os.path.join(INDEX_DIR, "faiss.index")
     METADATA_FILE = os.path.join(INDEX_DIR, "metadata.pkl")
+    INDEX_KEEP_SNAPSHOTS = int(os.getenv("INDEX_KEEP_SNAPSHOTS", "5")) # Published snapshots kept for rollback
     
     # Model Config
     EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
@@ -20,6 +21,7 @@ class Settings:
     # OpenAI Config
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
     OPENAI_MODEL = "gpt-3.5-turbo"
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "") # Any OpenAI-compatible endpoint, e.g. a local stub
     
     # Gemini Config
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
@@ -27,6 +29,23 @@ class Settings:
     
     # GPT4All Config
     GPT4ALL_MODEL = "orca-mini-3b-gguf2-q4_0.gguf" # Small, fast model
+    GPT4ALL_WORKERS = int(os.getenv("GPT4ALL_WORKERS", "0")) # Model processes; 0 = size to cores and free RAM
+    GPT4ALL_THREADS = int(os.getenv("GPT4ALL_THREADS", "4")) # CPU threads per model process
+    GPT4ALL_MODEL_RAM_GB = float(os.getenv("GPT4ALL_MODEL_RAM_GB", "2.5")) # RAM budgeted per model process
+    GPT4ALL_MAX_QUEUE = int(os.getenv("GPT4ALL_MAX_QUEUE", "16")) # Requests allowed to wait for a worker
+    GPT4ALL_MAX_TOKENS = int(os.getenv("GPT4ALL_MAX_TOKENS", "300")) # Upper bound on tokens per request
+    # Defaults to LLM_TIMEOUT so the pool cancels a generation when the router gives up on it
+    GPT4ALL_REQUEST_TIMEOUT = float(os.getenv("GPT4ALL_REQUEST_TIMEOUT", os.getenv("LLM_TIMEOUT", "20")))
+    GPT4ALL_LOAD_TIMEOUT = float(os.getenv("GPT4ALL_LOAD_TIMEOUT", "600"))
+    
+    # LLM Router Config
+    LLM_FALLBACKS = os.getenv("LLM_FALLBACKS", "") # Comma-separated backends tried after LLM_TYPE; mock is always last
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20")) # Seconds per provider call
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2")) # Retries per provider before falling back
+    LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.25")) # Seconds; full jitter, doubled per retry
+    LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "0")) # Seconds before hedging to the next backend; 0 disables
+    LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5")) # Consecutive failures that open the circuit
+    LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30")) # Seconds before an open circuit allows a trial call
     
     # App Config
     HOST = "0.0.0.0"
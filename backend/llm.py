@@ -1,14 +1,48 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Tuple
 import os
 from .config import settings
 
+def token_limit_kwargs(backend: "BaseLLM", max_tokens: int = None) -> Dict[str, Any]:
+    """`max_tokens` as a keyword argument, for backends that take a per-request limit."""
+    return {"max_tokens": max_tokens} if max_tokens and backend.accepts_max_tokens else {}
+
 class BaseLLM:
+    name = "base"
+    # Whether the router may retry this backend after a timeout
+    retry_timeouts = True
+    # Whether the router may send this backend a hedged copy of a slow request
+    hedge_target = True
+    # Whether generate_answer/stream_answer take a per-request max_tokens limit
+    accepts_max_tokens = False
+
     def generate_answer(self, query: str, context: List[Dict[str, Any]]) -> str:
         raise NotImplementedError
 
+    def generate_answer_with_backend(self, query: str, context: List[Dict[str, Any]],
+                                     max_tokens: int = None) -> Tuple[str, str]:
+        """The answer and the name of the backend that produced it (differs from this one behind a router)."""
+        return self.generate_answer(query, context, **token_limit_kwargs(self, max_tokens)), self.name
+
+    def stream_answer(self, query: str, context: List[Dict[str, Any]], max_tokens: int = None) -> Iterator[str]:
+        """Yields the answer in pieces. Backends without native streaming yield it whole."""
+        yield self.generate_answer(query, context, **token_limit_kwargs(self, max_tokens))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-provider call metrics, if the implementation tracks any."""
+        return {}
+
+    def close(self):
+        """Releases resources held by the backend (worker processes, connections)."""
+
 class MockLLM(BaseLLM):
+    name = "mock"
+    # Canned answers always win a race, so mock is only ever a last-resort fallback
+    hedge_target = False
+
     def generate_answer(self, query: str, context: List[Dict[str, Any]]) -> str:
         # Simple rule-based generation for testing without model
+        if not context:
+            return "**[MOCK ANSWER]** I found 0 related claims."
         return (
             f"**[MOCK ANSWER]** Based on the retrieved records, here is the information.\n\n"
             f"I found {len(context)} related claims.\n"
@@ -16,14 +50,24 @@ class MockLLM(BaseLLM):
         )
 
 class OpenAILLM(BaseLLM):
-    def __init__(self):
+    name = "openai"
+    accepts_max_tokens = True
+
+    def __init__(self, base_url: str = None, timeout: float = None):
         try:
             from openai import OpenAI
-            self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+            # One client per backend: its HTTP connection pool is reused across calls.
+            # Retries are left to the LLM router, so the SDK must not retry on its own.
+            self.client = OpenAI(
+                api_key=settings.OPENAI_API_KEY or "unused",
+                base_url=base_url or settings.OPENAI_BASE_URL or None,
+                timeout=timeout or settings.LLM_TIMEOUT,
+                max_retries=0
+            )
         except ImportError:
             raise ImportError("openai package not found.")
             
-    def generate_answer(self, query: str, context: List[Dict[str, Any]]) -> str:
+    def generate_answer(self, query: str, context: List[Dict[str, Any]], max_tokens: int = None) -> str:
         context_str = "\n\n".join([f"Document {i+1}:\n{doc['text']}" for i, doc in enumerate(context)])
         
         system_prompt = (
@@ -41,20 +85,25 @@ class OpenAILLM(BaseLLM):
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
-            temperature=0.0
+            temperature=0.0,
+            **({"max_tokens": max_tokens} if max_tokens else {})
         )
         return response.choices[0].message.content
 
 class GeminiLLM(BaseLLM):
-    def __init__(self):
+    name = "gemini"
+    accepts_max_tokens = True
+
+    def __init__(self, timeout: float = None):
         try:
             import google.generativeai as genai
             genai.configure(api_key=settings.GEMINI_API_KEY)
             self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
+            self.timeout = timeout or settings.LLM_TIMEOUT
         except ImportError:
             raise ImportError("google-generativeai package not found.")
             
-    def generate_answer(self, query: str, context: List[Dict[str, Any]]) -> str:
+    def generate_answer(self, query: str, context: List[Dict[str, Any]], max_tokens: int = None) -> str:
         context_str = "\n\n".join([f"Document {i+1}:\n{doc['text']}" for i, doc in enumerate(context)])
         
         prompt = (
@@ -65,34 +114,53 @@ class GeminiLLM(BaseLLM):
             f"Context:\n{context_str}\n\nQuestion: {query}"
         )
         
-        response = self.model.generate_content(prompt)
+        response = self.model.generate_content(
+            prompt,
+            generation_config={"max_output_tokens": max_tokens} if max_tokens else None,
+            request_options={"timeout": self.timeout}
+        )
         return response.text
 
 class GPT4AllLLM(BaseLLM):
-    def __init__(self):
+    name = "gpt4all"
+    # A timed-out local generation is CPU-bound; retrying would only queue the same work again
+    retry_timeouts = False
+    accepts_max_tokens = True
+
+    def __init__(self, pool=None):
         try:
-            from gpt4all import GPT4All
-            # This might download the model which takes time
-            print(f"Loading GPT4All model: {settings.GPT4ALL_MODEL}...")
-            self.model = GPT4All(settings.GPT4ALL_MODEL) 
+            import gpt4all  # noqa: F401 - fail fast here rather than in every worker
         except ImportError:
             raise ImportError("gpt4all package not found.")
+        from .local_inference import LocalInferencePool
+        # Models live in worker processes, loaded eagerly so no request pays for it
+        self.pool = pool or LocalInferencePool.from_settings().start(settings.GPT4ALL_LOAD_TIMEOUT)
             
-    def generate_answer(self, query: str, context: List[Dict[str, Any]]) -> str:
+    def build_prompt(self, query: str, context: List[Dict[str, Any]]) -> str:
         context_str = "\n".join([f"- {doc['text']}" for doc in context])
         
-        prompt = (
+        return (
             f"### System:\nYou are an insurance assistant. Use the context below to answer the question.\n\n"
             f"### Context:\n{context_str}\n\n"
             f"### User:\n{query}\n\n"
             f"### Assistant:\n"
         )
         
-        output = self.model.generate(prompt, max_tokens=300, temp=0.1)
-        return output
+    def generate_answer(self, query: str, context: List[Dict[str, Any]], max_tokens: int = None) -> str:
+        return self.pool.generate(self.build_prompt(query, context), max_tokens=max_tokens)
 
-def get_llm():
-    llm_type = settings.LLM_TYPE.lower()
+    def stream_answer(self, query: str, context: List[Dict[str, Any]], max_tokens: int = None) -> Iterator[str]:
+        return self.pool.stream(self.build_prompt(query, context), max_tokens=max_tokens)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return self.pool.get_stats()
+
+    def close(self):
+        self.pool.shutdown()
+
+def create_llm(llm_type: str) -> BaseLLM:
+    """Creates a single backend by name. Raises if it cannot be initialized."""
+    llm_type = llm_type.lower()
     print(f"Initializing LLM: {llm_type}")
     
     if llm_type == "openai":
@@ -100,10 +168,15 @@ def get_llm():
     elif llm_type == "gemini":
         return GeminiLLM()
     elif llm_type == "gpt4all":
-        try:
-            return GPT4AllLLM()
-        except Exception as e:
-            print(f"Failed to load GPT4All: {e}. Falling back to Mock.")
-            return MockLLM()
+        return GPT4AllLLM()
     else:
         return MockLLM()
+
+def get_llm() -> BaseLLM:
+    """
+    Returns the app's LLM: the configured backend followed by LLM_FALLBACKS and
+    finally MockLLM, wrapped in a router that handles timeouts, retries, hedging
+    and circuit breaking.
+    """
+    from .llm_router import LLMRouter
+    return LLMRouter.from_settings()
@@ -0,0 +1,289 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Iterator, Tuple
+
+from .config import settings
+from .llm import BaseLLM, create_llm, token_limit_kwargs
+from .local_inference import PoolOverloadedError
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when every backend in the chain failed, timed out or is circuit-open."""
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker. Opens after `failure_threshold` consecutive failures,
+    then after `reset_timeout` seconds lets a single trial call through (half-open):
+    success closes it again, failure re-opens it.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may be made now. Must be followed by a record_* call."""
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+class ProviderStats:
+    def __init__(self, window: int = 1000):
+        self.counters = {
+            "calls": 0, "successes": 0, "failures": 0, "timeouts": 0,
+            "hedges": 0, "hedge_wins": 0, "skipped_open": 0,
+        }
+        self.latencies = deque(maxlen=window)  # Recent successful call latencies (seconds)
+        self.lock = threading.Lock()
+
+    def incr(self, counter: str):
+        with self.lock:
+            self.counters[counter] += 1
+
+    def record_latency(self, latency: float):
+        with self.lock:
+            self.latencies.append(latency)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            data = dict(self.counters)
+            latencies = sorted(self.latencies)
+        data["latency_ms"] = {
+            f"p{p}": latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000
+            for p in (50, 95, 99)
+        } if latencies else {}
+        return data
+
+class LLMRouter(BaseLLM):
+    """
+    Routes generate_answer calls over an ordered chain of backends.
+
+    Each call to a backend runs on a shared worker pool with a per-call timeout and
+    is retried with full-jitter exponential backoff. If `hedge_delay` is set and the
+    call has not returned by then, the same request is also sent to the next
+    available backend that is a hedge target (never MockLLM) and the first success wins. A backend whose circuit is open is
+    skipped, so traffic falls through the chain (which normally ends with MockLLM).
+    """
+    def __init__(self, backends: List[Tuple[str, BaseLLM]], timeout: float = 20.0, max_retries: int = 2,
+                 backoff_base: float = 0.25, hedge_delay: float = 0.0, breaker_threshold: int = 5,
+                 breaker_reset: float = 30.0, max_workers: int = 32):
+        if not backends:
+            raise ValueError("LLMRouter needs at least one backend.")
+        self.backends = backends
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.hedge_delay = hedge_delay
+        self.breakers = {name: CircuitBreaker(breaker_threshold, breaker_reset) for name, _ in backends}
+        self.stats = {name: ProviderStats() for name, _ in backends}
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+
+    @classmethod
+    def from_settings(cls) -> "LLMRouter":
+        names = [settings.LLM_TYPE] + settings.LLM_FALLBACKS.split(",") + ["mock"]
+        chain = []
+        for name in (n.strip().lower() for n in names):
+            if name and name not in chain:
+                chain.append(name)
+            if name == "mock":
+                break
+
+        backends = []
+        for name in chain:
+            try:
+                backends.append((name, create_llm(name)))
+            except Exception as e:
+                print(f"Failed to load {name}: {e}. Skipping.")
+        return cls(
+            backends,
+            timeout=settings.LLM_TIMEOUT,
+            max_retries=settings.LLM_MAX_RETRIES,
+            backoff_base=settings.LLM_BACKOFF_BASE,
+            hedge_delay=settings.LLM_HEDGE_DELAY,
+            breaker_threshold=settings.LLM_BREAKER_THRESHOLD,
+            breaker_reset=settings.LLM_BREAKER_RESET,
+        )
+
+    name = "router"
+
+    def generate_answer(self, query: str, context: List[Dict[str, Any]], max_tokens: int = None) -> str:
+        return self.generate_answer_with_backend(query, context, max_tokens)[0]
+
+    def generate_answer_with_backend(self, query: str, context: List[Dict[str, Any]],
+                                     max_tokens: int = None) -> Tuple[str, str]:
+        """
+        The answer and the name of the backend that produced it, which may be a fallback
+        or hedge. `max_tokens` is passed to the backends that support a per-request limit.
+        """
+        errors = []
+        for i, (name, backend) in enumerate(self.backends):
+            if not self.breakers[name].allow():
+                self.stats[name].incr("skipped_open")
+                continue
+            for attempt in range(self.max_retries + 1):
+                try:
+                    hedge_candidates = [b for b in self.backends[i + 1:] if b[1].hedge_target]
+                    return self._attempt(name, backend, hedge_candidates, query, context, max_tokens)
+                except Exception as e:
+                    errors.append(f"{name}: {e!r}")
+                    # A full queue will not drain within a backoff; shed to the next backend
+                    if isinstance(e, PoolOverloadedError):
+                        break
+                    if isinstance(e, TimeoutError) and not backend.retry_timeouts:
+                        break
+                if attempt == self.max_retries or not self.breakers[name].allow():
+                    break
+                time.sleep(random.uniform(0, min(self.timeout, self.backoff_base * 2 ** attempt)))
+        raise LLMUnavailableError("All LLM backends failed: " + "; ".join(errors))
+
+    def stream_answer(self, query: str, context: List[Dict[str, Any]], max_tokens: int = None) -> Iterator[str]:
+        """
+        Streams from the first backend that produces a first chunk. Once output has
+        started it cannot be retried or hedged, so only pre-output failures fall back.
+        """
+        errors = []
+        for name, backend in self.backends:
+            if not self.breakers[name].allow():
+                self.stats[name].incr("skipped_open")
+                continue
+            self.stats[name].incr("calls")
+            start = time.monotonic()
+            try:
+                chunks = iter(backend.stream_answer(query, context, **token_limit_kwargs(backend, max_tokens)))
+                first = next(chunks, None)
+            except Exception as e:
+                self.stats[name].incr("failures")
+                self.breakers[name].record_failure()
+                errors.append(f"{name}: {e!r}")
+                continue
+
+            try:
+                if first is not None:
+                    yield first
+                yield from chunks
+            except GeneratorExit:
+                # The client went away mid-stream; the backend itself was healthy
+                self.breakers[name].record_success()
+                raise
+            except Exception:
+                self.stats[name].incr("failures")
+                self.breakers[name].record_failure()
+                raise
+            self.stats[name].incr("successes")
+            self.stats[name].record_latency(time.monotonic() - start)
+            self.breakers[name].record_success()
+            return
+        raise LLMUnavailableError("All LLM backends failed: " + "; ".join(errors))
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {}
+        for name, backend in self.backends:
+            stats[name] = {**self.stats[name].snapshot(), "circuit": self.breakers[name].state}
+            backend_stats = backend.get_stats()
+            if backend_stats:
+                stats[name]["backend"] = backend_stats
+        return stats
+
+    def close(self):
+        for _, backend in self.backends:
+            backend.close()
+        self.executor.shutdown(wait=False)
+
+    def _timed_call(self, backend: BaseLLM, query: str, context: List[Dict[str, Any]],
+                    max_tokens: int = None) -> Tuple[str, float]:
+        start = time.monotonic()
+        result = backend.generate_answer(query, context, **token_limit_kwargs(backend, max_tokens))
+        return result, time.monotonic() - start
+
+    def _submit(self, name: str, backend: BaseLLM, query: str, context: List[Dict[str, Any]], pending: dict,
+                max_tokens: int = None):
+        self.stats[name].incr("calls")
+        future = self.executor.submit(self._timed_call, backend, query, context, max_tokens)
+        pending[future] = (name, time.monotonic() + self.timeout)
+
+    def _record(self, name: str, future) -> Tuple[bool, Any]:
+        """Records a finished call's outcome. Returns (ok, result_or_error)."""
+        try:
+            result, latency = future.result()
+        except Exception as e:
+            self.stats[name].incr("failures")
+            self.breakers[name].record_failure()
+            return False, e
+        self.stats[name].incr("successes")
+        self.stats[name].record_latency(latency)
+        self.breakers[name].record_success()
+        return True, result
+
+    def _attempt(self, name: str, backend: BaseLLM, hedge_candidates: List[Tuple[str, BaseLLM]],
+                 query: str, context: List[Dict[str, Any]], max_tokens: int = None) -> Tuple[str, str]:
+        """
+        One try at `backend`, optionally hedged to the first allowed backend in
+        `hedge_candidates`. Returns (answer, name of the backend that answered).
+        """
+        pending = {}
+        self._submit(name, backend, query, context, pending, max_tokens)
+
+        if self.hedge_delay > 0 and hedge_candidates:
+            done, _ = wait(pending, timeout=min(self.hedge_delay, self.timeout))
+            if not done:
+                for hedge_name, hedge_backend in hedge_candidates:
+                    if self.breakers[hedge_name].allow():
+                        self.stats[hedge_name].incr("hedges")
+                        self._submit(hedge_name, hedge_backend, query, context, pending, max_tokens)
+                        break
+
+        last_error = None
+        while pending:
+            now = time.monotonic()
+            for future, (future_name, deadline) in list(pending.items()):
+                if deadline <= now and not future.done():
+                    del pending[future]
+                    future.cancel()
+                    self.stats[future_name].incr("timeouts")
+                    self.breakers[future_name].record_failure()
+                    last_error = TimeoutError(f"{future_name} timed out after {self.timeout}s")
+            if not pending:
+                break
+
+            next_deadline = min(deadline for _, deadline in pending.values())
+            done, _ = wait(pending, timeout=max(0.0, next_deadline - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                future_name, _ = pending.pop(future)
+                ok, value = self._record(future_name, future)
+                if not ok:
+                    last_error = value
+                    continue
+                if future_name != name:
+                    self.stats[future_name].incr("hedge_wins")
+                # Losers keep running; record their outcome when they finish so the
+                # breakers and metrics still see them.
+                for loser, (loser_name, _) in pending.items():
+                    loser.add_done_callback(lambda f, n=loser_name: self._record(n, f))
+                return value, future_name
+        raise last_error or TimeoutError(f"{name} timed out after {self.timeout}s")
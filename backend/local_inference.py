@@ -0,0 +1,325 @@
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterator
+
+from .config import settings
+
+class PoolOverloadedError(RuntimeError):
+    """Raised when the request queue is full; the caller should shed or fall back."""
+
+def load_gpt4all(model_name: str, n_threads: int):
+    from gpt4all import GPT4All
+    # This might download the model which takes time
+    print(f"Loading GPT4All model: {model_name} (pid {os.getpid()})...")
+    return GPT4All(model_name, n_threads=n_threads)
+
+def available_memory() -> int:
+    """Bytes of RAM currently available, or 0 if it cannot be determined."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return 0
+
+def default_num_workers(threads_per_worker: int, model_ram_bytes: int) -> int:
+    """As many model processes as both the cores and (80% of) the free RAM allow."""
+    by_cpu = max(1, (os.cpu_count() or 1) // max(1, threads_per_worker))
+    free = available_memory()
+    by_ram = max(1, int(free * 0.8) // model_ram_bytes) if free and model_ram_bytes else by_cpu
+    return max(1, min(by_cpu, by_ram))
+
+def _take_cancelled(cancelled, request_id: int) -> bool:
+    """Removes `request_id` from the shared cancelled-ids table. Returns whether it was there."""
+    with cancelled.get_lock():
+        for slot in range(len(cancelled)):
+            if cancelled[slot] == request_id:
+                cancelled[slot] = -1
+                return True
+    return False
+
+def _worker_main(worker_id: int, model_factory: Callable, model_name: str, n_threads: int, tasks, results, cancelled):
+    """
+    Worker process: loads one model instance, then streams tokens for each task it
+    pulls. Cancelled requests are skipped, or stopped between tokens if already running.
+    """
+    try:
+        model = model_factory(model_name, n_threads)
+    except Exception as e:
+        results.put((worker_id, None, "load_error", f"worker {worker_id}: {e!r}"))
+        return
+    results.put((worker_id, None, "ready", None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        request_id, prompt, max_tokens, temp = task
+        results.put((worker_id, request_id, "start", None))
+        if _take_cancelled(cancelled, request_id):
+            results.put((worker_id, request_id, "cancelled", None))
+            continue
+        kind, tokens = "done", None
+        try:
+            tokens = model.generate(prompt, max_tokens=max_tokens, temp=temp, streaming=True)
+            for token in tokens:
+                if _take_cancelled(cancelled, request_id):
+                    kind = "cancelled"
+                    break
+                results.put((worker_id, request_id, "token", token))
+            results.put((worker_id, request_id, kind, None))
+        except Exception as e:
+            results.put((worker_id, request_id, "error", repr(e)))
+        finally:
+            if hasattr(tokens, "close"):
+                tokens.close()  # Stops the model's generation loop if we broke out early
+
+def _percentiles(values) -> Dict[str, float]:
+    values = sorted(values)
+    if not values:
+        return {}
+    return {f"p{p}": values[min(len(values) - 1, int(len(values) * p / 100))] for p in (50, 95, 99)}
+
+class LocalInferencePool:
+    """
+    A pool of worker processes, each holding its own model instance, fed from one
+    shared task queue. Admission control caps outstanding requests at
+    `num_workers + max_queue`; beyond that, requests are rejected immediately
+    instead of queueing without bound. Tokens stream back through a result queue
+    that a collector thread routes to per-request mailboxes.
+
+    A request whose caller gives up (timeout, client disconnect) is cancelled, so the
+    worker skips or stops it instead of generating for nobody. The collector also
+    watches the workers: when one dies, its request fails, its slot is released and
+    the worker is respawned.
+    """
+    def __init__(self, model_name: str, num_workers: int, max_queue: int = 16, max_tokens: int = 300,
+                 n_threads: int = 4, request_timeout: float = 120.0, model_factory: Callable = load_gpt4all,
+                 health_interval: float = 0.5):
+        self.model_name = model_name
+        self.num_workers = num_workers
+        self.max_queue = max_queue
+        self.max_tokens = max_tokens
+        self.n_threads = n_threads
+        self.request_timeout = request_timeout
+        self.model_factory = model_factory
+        self.health_interval = health_interval
+
+        self.processes = []
+        self.mailboxes = {}
+        self.request_ids = itertools.count()
+        self.lock = threading.Lock()
+        self.ready = threading.Semaphore(0)
+        self.load_errors = []
+        self.failed_workers = set()  # Worker slots whose model failed to load; not respawned
+        self.active = {}  # request_id -> worker_id running it, or None while queued
+        self.closed = True  # Dead workers are only respawned between start() and shutdown()
+        self.collector = None
+        self.counters = {"completed": 0, "rejected": 0, "errors": 0, "cancelled": 0, "tokens": 0, "worker_restarts": 0}
+        self.generation_seconds = 0.0
+        self.queue_waits = deque(maxlen=1000)  # Seconds from submit until a worker picked the request up
+        self.latencies = deque(maxlen=1000)  # Seconds from submit until the last token
+
+    @classmethod
+    def from_settings(cls) -> "LocalInferencePool":
+        num_workers = settings.GPT4ALL_WORKERS or default_num_workers(
+            settings.GPT4ALL_THREADS, int(settings.GPT4ALL_MODEL_RAM_GB * 1024 ** 3)
+        )
+        return cls(
+            settings.GPT4ALL_MODEL,
+            num_workers=num_workers,
+            max_queue=settings.GPT4ALL_MAX_QUEUE,
+            max_tokens=settings.GPT4ALL_MAX_TOKENS,
+            n_threads=settings.GPT4ALL_THREADS,
+            request_timeout=settings.GPT4ALL_REQUEST_TIMEOUT,
+        )
+
+    def start(self, load_timeout: float = 600.0):
+        """Spawns the workers and blocks until every model is loaded."""
+        self.ctx = mp.get_context("spawn")
+        self.tasks = self.ctx.Queue()
+        self.results = self.ctx.Queue()
+        # One slot per request that can be outstanding; -1 marks a free slot
+        self.cancelled = self.ctx.Array("q", [-1] * (self.num_workers + self.max_queue))
+        print(f"Starting {self.num_workers} local inference worker(s)...")
+        self.processes = [self._spawn(worker_id) for worker_id in range(self.num_workers)]
+        self.collector = threading.Thread(target=self._collect, daemon=True, name="local-inference-collector")
+        self.collector.start()
+
+        deadline = time.monotonic() + load_timeout
+        for _ in range(self.num_workers):
+            if not self.ready.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                self.shutdown()
+                raise TimeoutError(f"Local model did not load within {load_timeout}s")
+            if self.load_errors:
+                self.shutdown()
+                raise RuntimeError(f"Local model failed to load: {self.load_errors[0]}")
+        self.closed = False
+        return self
+
+    def _spawn(self, worker_id: int):
+        process = self.ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.model_factory, self.model_name, self.n_threads, self.tasks, self.results, self.cancelled),
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def shutdown(self):
+        self.closed = True
+        if self.collector is None:
+            return
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        self.results.put((None, None, "stop", None))
+        self.collector.join(timeout=5)
+        self.collector = None
+
+    def _collect(self):
+        next_check = time.monotonic() + self.health_interval
+        while True:
+            try:
+                worker_id, request_id, kind, payload = self.results.get(timeout=self.health_interval)
+            except queue.Empty:
+                kind = None
+            except (EOFError, OSError):
+                return
+            if kind == "stop":
+                return
+            if kind is not None:
+                self._route(worker_id, request_id, kind, payload)
+            if time.monotonic() >= next_check:
+                self._replace_dead_workers()
+                next_check = time.monotonic() + self.health_interval
+
+    def _route(self, worker_id: int, request_id: int, kind: str, payload: Any):
+        if request_id is None:
+            if kind == "load_error":
+                self.load_errors.append(payload)
+                self.failed_workers.add(worker_id)
+                print(f"Local inference worker failed to load: {payload}")
+            self.ready.release()
+            return
+        with self.lock:
+            if request_id not in self.active:
+                return  # Already failed because its worker died
+            if kind == "start":
+                self.active[request_id] = worker_id
+            elif kind in ("done", "error", "cancelled"):
+                del self.active[request_id]
+                # Clear a cancel that raced with completion so its slot is reused
+                _take_cancelled(self.cancelled, request_id)
+                if kind == "cancelled":
+                    self.counters["cancelled"] += 1
+        self._deliver(request_id, kind, payload)
+
+    def _deliver(self, request_id: int, kind: str, payload: Any):
+        mailbox = self.mailboxes.get(request_id)
+        if mailbox is not None:
+            mailbox.put((kind, payload, time.monotonic()))
+
+    def _replace_dead_workers(self):
+        """Fails the request a dead worker was running, frees its slot and respawns it."""
+        for worker_id, process in enumerate(self.processes):
+            if self.closed or process.is_alive() or worker_id in self.failed_workers:
+                continue
+            with self.lock:
+                lost = [rid for rid, wid in self.active.items() if wid == worker_id]
+                for request_id in lost:
+                    del self.active[request_id]
+                    _take_cancelled(self.cancelled, request_id)
+                self.counters["worker_restarts"] += 1
+            print(f"Local inference worker {worker_id} died (exit code {process.exitcode}); respawning.")
+            for request_id in lost:
+                self._deliver(request_id, "error", f"worker {worker_id} died (exit code {process.exitcode})")
+            self.processes[worker_id] = self._spawn(worker_id)
+
+    def _cancel(self, request_id: int):
+        """Asks the workers to skip or stop a request whose caller has gone away."""
+        with self.lock:
+            if request_id not in self.active:
+                return
+            with self.cancelled.get_lock():
+                for slot in range(len(self.cancelled)):
+                    if self.cancelled[slot] == -1:
+                        self.cancelled[slot] = request_id
+                        return
+
+    def stream(self, prompt: str, max_tokens: int = None, temp: float = 0.1) -> Iterator[str]:
+        """Yields tokens as the worker produces them. `max_tokens` is capped at the pool limit."""
+        request_id = next(self.request_ids)
+        mailbox = queue.Queue()
+        with self.lock:
+            if len(self.active) >= self.num_workers + self.max_queue:
+                self.counters["rejected"] += 1
+                raise PoolOverloadedError(f"Local inference queue is full ({self.max_queue} waiting)")
+            self.active[request_id] = None
+            self.mailboxes[request_id] = mailbox
+        submitted = time.monotonic()
+        started = None
+        tokens = 0
+        finished = False
+        self.tasks.put((request_id, prompt, min(max_tokens or self.max_tokens, self.max_tokens), temp))
+        try:
+            while True:
+                remaining = submitted + self.request_timeout - time.monotonic()
+                try:
+                    kind, payload, at = mailbox.get(timeout=max(0.0, remaining))
+                except queue.Empty:
+                    raise TimeoutError(f"Local inference timed out after {self.request_timeout}s")
+                if kind == "start":
+                    started = at
+                    self.queue_waits.append(at - submitted)
+                elif kind == "token":
+                    tokens += 1
+                    yield payload
+                elif kind == "done":
+                    finished = True
+                    with self.lock:
+                        self.counters["completed"] += 1
+                        self.counters["tokens"] += tokens
+                        self.generation_seconds += at - started
+                    self.latencies.append(at - submitted)
+                    return
+                else:
+                    finished = True
+                    with self.lock:
+                        self.counters["errors"] += 1
+                    raise RuntimeError(f"Local inference failed: {payload}")
+        finally:
+            self.mailboxes.pop(request_id, None)
+            # Timed out, or the consumer stopped reading (e.g. client disconnect)
+            if not finished:
+                self._cancel(request_id)
+
+    def generate(self, prompt: str, max_tokens: int = None, temp: float = 0.1) -> str:
+        return "".join(self.stream(prompt, max_tokens, temp))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self.counters)
+            stats["in_flight"] = sum(worker_id is not None for worker_id in self.active.values())
+            stats["queued"] = len(self.active) - stats["in_flight"]
+            generation_seconds = self.generation_seconds
+        stats["workers"] = self.num_workers
+        stats["alive_workers"] = sum(p.is_alive() for p in self.processes)
+        stats["tokens_per_s"] = stats["tokens"] / generation_seconds if generation_seconds > 0 else 0.0
+        stats["queue_wait_ms"] = {k: v * 1000 for k, v in _percentiles(self.queue_waits).items()}
+        stats["latency_ms"] = {k: v * 1000 for k, v in _percentiles(self.latencies).items()}
+        return stats
@@ -4,7 +4,8 @@ import time
 from typing import List, Optional
 from fastapi import FastAPI, HTTPException, Body
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
 # Add parent directory to path to import sibling modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -12,7 +13,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from backend.config import settings
 from backend.llm import get_llm
 from etl.processor import ClaimProcessor
-from indexing.vector_store import VectorStore
+from indexing.vector_store import SnapshotVerificationError, VectorStore
 
 app = FastAPI(title="RAG Claims Assistant", version="1.0.0")
 
@@ -29,10 +30,12 @@ app.add_middleware(
 vector_store = VectorStore(
     model_name=settings.EMBEDDING_MODEL,
     index_file=settings.INDEX_FILE,
-    metadata_file=settings.METADATA_FILE
+    metadata_file=settings.METADATA_FILE,
+    index_dir=settings.INDEX_DIR,
+    keep_snapshots=settings.INDEX_KEEP_SNAPSHOTS
 )
 llm = None 
-# specialized deferred loader for LLM to avoid startup delay if using local model
+# Created on first use; startup_event calls this so model loading happens before traffic
 def get_app_llm():
     global llm
     if llm is None:
@@ -42,7 +45,9 @@ def get_app_llm():
 # Models
 class QueryRequest(BaseModel):
     query: str
-    k: int = 5
+    k: int = Field(5, ge=1)
+    group_by_claim: bool = True # At most one chunk per claim in the top k
+    max_tokens: Optional[int] = Field(None, ge=1, le=4096) # Answer length limit; local models also cap it at GPT4ALL_MAX_TOKENS
 
 class SourceDocument(BaseModel):
     doc_id: str
@@ -60,19 +65,36 @@ class IngestResponse(BaseModel):
     message: str
     num_records: int
     num_chunks: int
+    version: Optional[str] = None
+
+class RollbackRequest(BaseModel):
+    version: Optional[str] = None # Defaults to the snapshot before the current one
 
 # Routes
 @app.on_event("startup")
 def startup_event():
-    # Try to load existing index
+    # Select the published snapshot; its files are verified and read on first query
     try:
         vector_store.load_index()
-    except:
-        print("No existing index found. Please run /ingest.")
+    except Exception as e:
+        print(f"No usable index found ({e}). Please run /ingest.")
+    # Load the LLM eagerly (local models take a while) so the first query doesn't pay for it
+    get_app_llm()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    # Stops local inference worker processes
+    if llm is not None:
+        llm.close()
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok", "index_size": vector_store.index.ntotal if vector_store.index else 0}
+    return {"status": "ok", "index_size": vector_store.size(), "index_version": vector_store.version}
+
+@app.get("/metrics/llm")
+def llm_metrics():
+    """Per-provider latency, error, hedging and circuit-breaker state."""
+    return get_app_llm().get_stats()
 
 @app.post("/ingest", response_model=IngestResponse)
 def ingest_data():
@@ -82,20 +104,45 @@ def ingest_data():
     
     start_time = time.time()
     
-    processor = ClaimProcessor()
+    processor = ClaimProcessor(token_counter=vector_store.token_counter())
     records = processor.load_csv(settings.CLAIMS_CSV)
     documents = processor.process_records(records)
     
     vector_store.create_index(documents)
-    vector_store.save_index()
+    version = vector_store.save_index()
     
     return {
         "message": "Ingestion complete",
         "num_records": len(records),
         "num_chunks": len(documents),
+        "version": version,
         "duration_seconds": time.time() - start_time
     }
 
+@app.get("/index/snapshots")
+def list_snapshots():
+    """Published index snapshots, oldest first."""
+    return vector_store.list_snapshots()
+
+@app.post("/index/rollback")
+def rollback_index(request: RollbackRequest = Body(default=RollbackRequest())):
+    """Switches to an earlier snapshot without re-embedding."""
+    try:
+        version = vector_store.rollback(request.version)
+    except SnapshotVerificationError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"message": "Rollback complete", "version": version, "index_size": vector_store.size()}
+
+# Shared by /query and /query/stream; a snapshot that fails its lazy checksum check is a 503, not a 500
+def retrieve(request: QueryRequest, filters: dict):
+    group_by = "claim_id" if request.group_by_claim else None
+    try:
+        return vector_store.search(request.query, k=request.k, filters=filters, group_by=group_by)
+    except SnapshotVerificationError as e:
+        raise HTTPException(status_code=503, detail=f"{e} Roll back or run /ingest.")
+
 # Helper for extracting filters
 def extract_filters(query: str, current_llm) -> dict:
     """
@@ -142,7 +189,7 @@ def extract_filters(query: str, current_llm) -> dict:
 
 @app.post("/query", response_model=QueryResponse)
 def query_endpoint(request: QueryRequest):
-    if not vector_store.index or vector_store.index.ntotal == 0:
+    if vector_store.size() == 0:
         raise HTTPException(status_code=400, detail="Index is empty. Please run /ingest first.")
         
     start_time = time.time()
@@ -152,9 +199,11 @@ def query_endpoint(request: QueryRequest):
     # 1. Extract Filters
     filters = extract_filters(request.query, current_llm)
     print(f"Extracted Filters: {filters}")
+    filters_done = time.time()
     
     # 2. Retrieval with Filters
-    results = vector_store.search(request.query, k=request.k, filters=filters)
+    results = retrieve(request, filters)
+    retrieval_done = time.time()
     
     # Format sources for LLM
     context = []
@@ -171,15 +220,35 @@ def query_endpoint(request: QueryRequest):
         ))
         
     # 3. Generation
-    answer = current_llm.generate_answer(request.query, context)
+    answer, answered_by = current_llm.generate_answer_with_backend(request.query, context, max_tokens=request.max_tokens)
+    generation_done = time.time()
     
     return {
         "answer": answer,
         "sources": sources_response,
         "metadata": {
-            "processing_latency": time.time() - start_time,
+            "processing_latency": generation_done - start_time,
+            "stage_latency": {
+                "filter_extraction": filters_done - start_time,
+                "retrieval": retrieval_done - filters_done,
+                "generation": generation_done - retrieval_done
+            },
             "embedding_model": settings.EMBEDDING_MODEL,
-            "llm_type": settings.LLM_TYPE,
+            "llm_type": answered_by, # Backend that actually answered; differs from LLM_TYPE after a fallback
             "applied_filters": filters
         }
     }
+
+@app.post("/query/stream")
+def query_stream_endpoint(request: QueryRequest):
+    """Same retrieval as /query, but streams the answer text as it is generated."""
+    if vector_store.size() == 0:
+        raise HTTPException(status_code=400, detail="Index is empty. Please run /ingest first.")
+    
+    current_llm = get_app_llm()
+    filters = extract_filters(request.query, current_llm)
+    results = retrieve(request, filters)
+    context = [doc for doc, _ in results]
+    
+    # Sync generators are iterated in the threadpool, so generation stays off the event loop
+    return StreamingResponse(current_llm.stream_answer(request.query, context, max_tokens=request.max_tokens), media_type="text/plain")
@@ -0,0 +1,115 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add parent directory to path to import sibling modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run_benchmarks import make_store
+from data_gen.generate_synthetic_claims import DIAGNOSIS_NAMES, generate_claims
+from etl.processor import ClaimProcessor, count_tokens_approx
+
+# Configuration
+DEFAULT_CLAIMS = 2000
+DEFAULT_K = 10
+QUERY_TEMPLATE = "Show me claims for patients with {diagnosis}"
+
+def legacy_char_chunks(processor: ClaimProcessor, records: list, size: int = 500, overlap: int = 50) -> list:
+    """The previous fixed-width character chunker, kept here as the comparison baseline."""
+    docs = []
+    for record in records:
+        text = processor.create_search_document(record)
+        chunks = [text[i:i + size] for i in range(0, len(text), size - overlap)] if len(text) > size else [text]
+        for i, chunk in enumerate(chunks):
+            docs.append({"id": f"{record['claim_id']}_{i}", "text": chunk, "metadata": record})
+    return docs
+
+def index_bytes(store) -> int:
+    if store.index is not None:
+        import faiss
+        return int(faiss.serialize_index(store.index).nbytes)
+    return int(store.embeddings.nbytes)
+
+def retrieval_quality(store, k: int, group_by: str = None) -> dict:
+    """
+    Diagnosis queries graded by metadata: a hit is a result whose claim has the
+    queried diagnosis. Also reports how many of the k slots hold distinct claims.
+    """
+    precision, distinct, latency = [], [], []
+    for diagnosis in DIAGNOSIS_NAMES:
+        start = time.perf_counter()
+        results = store.search(QUERY_TEMPLATE.format(diagnosis=diagnosis), k=k, group_by=group_by)
+        latency.append(time.perf_counter() - start)
+        precision.append(np.mean([doc["metadata"]["diagnosis"] == diagnosis for doc, _ in results]) if results else 0.0)
+        distinct.append(len({doc["metadata"]["claim_id"] for doc, _ in results}) / k)
+    return {
+        "precision_at_k": float(np.mean(precision)),
+        "distinct_claims_at_k": float(np.mean(distinct)),
+        "search_ms_p50": float(np.median(latency) * 1000),
+    }
+
+def run(num_claims: int = DEFAULT_CLAIMS, k: int = DEFAULT_K, encoder: str = "hash") -> dict:
+    report = {"meta": {"num_claims": num_claims, "k": k, "encoder": encoder}, "results": {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = generate_claims(num_rows=num_claims, output=os.path.join(workdir, "claims.csv"), long_notes=True)[0]
+        processor = ClaimProcessor()
+        records = processor.load_csv(csv_path)
+
+        store = make_store(encoder, workdir)
+        chunkers = {
+            "char": lambda: legacy_char_chunks(processor, records),
+            "sentence": lambda: ClaimProcessor(token_counter=store.token_counter()).process_records(records),
+        }
+        for name, chunker in chunkers.items():
+            start = time.perf_counter()
+            docs = chunker()
+            chunk_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            store.create_index(docs)
+            index_seconds = time.perf_counter() - start
+
+            tokens = count_tokens_approx([doc["text"] for doc in docs])
+            report["results"][name] = {
+                "num_chunks": len(docs),
+                "chunks_per_claim": len(docs) / len(records),
+                "tokens_per_chunk_mean": float(np.mean(tokens)),
+                "tokens_per_chunk_max": int(np.max(tokens)),
+                "index_bytes": index_bytes(store),
+                "chunk_s": chunk_seconds,
+                "index_s": index_seconds,
+                "ungrouped": retrieval_quality(store, k),
+                "grouped": retrieval_quality(store, k, group_by="claim_id"),
+            }
+    return report
+
+def print_report(report: dict):
+    print(f"{'chunker':10} {'chunks':>8} {'tok/chunk':>10} {'index MB':>9} "
+          f"{'P@k':>6} {'P@k grp':>8} {'distinct':>9} {'distinct grp':>13}")
+    for name, r in report["results"].items():
+        print(f"{name:10} {r['num_chunks']:8d} {r['tokens_per_chunk_mean']:10.1f} {r['index_bytes'] / 1e6:9.2f} "
+              f"{r['ungrouped']['precision_at_k']:6.2f} {r['grouped']['precision_at_k']:8.2f} "
+              f"{r['ungrouped']['distinct_claims_at_k']:9.2f} {r['grouped']['distinct_claims_at_k']:13.2f}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare chunkers and claim grouping on long-note claims.")
+    parser.add_argument("-n", "--num-claims", type=int, default=DEFAULT_CLAIMS)
+    parser.add_argument("-k", type=int, default=DEFAULT_K)
+    parser.add_argument("--encoder", default="hash",
+                        help="'hash' for the offline stand-in, or a SentenceTransformer model name")
+    parser.add_argument("-o", "--output", help="Write the report as JSON")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = run(args.num_claims, args.k, args.encoder)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.output}")
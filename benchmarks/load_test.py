@@ -0,0 +1,240 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+import numpy as np
+
+# Add parent directory to path to import sibling modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from demo_client import QUERIES
+
+# Configuration
+BASE_URL = "http://localhost:8000"
+DEFAULT_CONCURRENCY = 20
+DEFAULT_REQUESTS = 500
+REQUEST_TIMEOUT = 60.0
+PERCENTILES = [50, 95, 99]
+# Histogram bucket upper bounds in seconds (log-spaced); the last bucket is open-ended
+HISTOGRAM_BOUNDS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+def load_queries(path: str = None) -> list:
+    """
+    Reads queries from a workload file: JSONL as written by
+    data_gen/generate_query_workload.py, or one plain query per line.
+    Falls back to the demo client's sample queries.
+    """
+    if not path:
+        return list(QUERIES)
+    queries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            queries.append(json.loads(line)["query"] if line.startswith("{") else line)
+    return queries
+
+async def send_query(client: httpx.AsyncClient, query: str, k: int, scheduled_at: float = None) -> dict:
+    """
+    Sends one /query request and returns its sample.
+    In open-loop mode latency is measured from `scheduled_at`, so time spent waiting
+    for a free slot counts against the server (avoids coordinated omission).
+    """
+    start = scheduled_at if scheduled_at is not None else time.perf_counter()
+    sample = {"ok": False, "status": None, "stages": {}}
+    try:
+        response = await client.post("/query", json={"query": query, "k": k})
+        sample["status"] = response.status_code
+        if response.status_code == 200:
+            metadata = response.json().get("metadata", {})
+            sample["ok"] = True
+            sample["stages"] = dict(metadata.get("stage_latency", {}))
+            if "processing_latency" in metadata:
+                sample["stages"]["server_total"] = metadata["processing_latency"]
+    except httpx.HTTPError as e:
+        sample["status"] = type(e).__name__
+    sample["latency"] = time.perf_counter() - start
+    return sample
+
+async def run_closed_loop(client, queries, k: int, concurrency: int, num_requests: int, duration: float) -> list:
+    """`concurrency` virtual users, each sending its next request as soon as the last completes."""
+    query_iter = itertools.cycle(queries)
+    counter = itertools.count()
+    deadline = time.perf_counter() + duration if duration else None
+    samples = []
+
+    async def user():
+        while True:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            if deadline is None and next(counter) >= num_requests:
+                return
+            samples.append(await send_query(client, next(query_iter), k))
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return samples
+
+async def run_open_loop(client, queries, k: int, rps: float, max_in_flight: int, num_requests: int, duration: float) -> list:
+    """Issues requests on a fixed schedule of `rps`, independent of how fast responses come back."""
+    total = int(rps * duration) if duration else num_requests
+    query_iter = itertools.cycle(queries)
+    slots = asyncio.Semaphore(max_in_flight)
+    start = time.perf_counter()
+
+    async def fire(scheduled_at: float, query: str):
+        async with slots:
+            return await send_query(client, query, k, scheduled_at)
+
+    tasks = []
+    for i in range(total):
+        scheduled_at = start + i / rps
+        delay = scheduled_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(fire(scheduled_at, next(query_iter))))
+    return list(await asyncio.gather(*tasks))
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {}
+    values = np.asarray(values)
+    stats = {f"p{p}": float(np.percentile(values, p)) for p in PERCENTILES}
+    stats["mean"] = float(values.mean())
+    stats["max"] = float(values.max())
+    return stats
+
+def histogram(values: list) -> list:
+    """Counts per bucket as [(upper_bound_or_None, count), ...]."""
+    counts = np.histogram(values, bins=[0.0] + HISTOGRAM_BOUNDS + [np.inf])[0] if values else []
+    return list(zip(HISTOGRAM_BOUNDS + [None], [int(c) for c in counts]))
+
+def summarize(samples: list, elapsed: float) -> dict:
+    ok = [s for s in samples if s["ok"]]
+    errors = {}
+    for s in samples:
+        if not s["ok"]:
+            errors[str(s["status"])] = errors.get(str(s["status"]), 0) + 1
+    latencies = [s["latency"] for s in ok]
+
+    stage_names = sorted({name for s in ok for name in s["stages"]})
+    stages = {name: percentiles([s["stages"][name] for s in ok if name in s["stages"]]) for name in stage_names}
+
+    return {
+        "requests": len(samples),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(ok) / elapsed if elapsed > 0 else 0.0,
+        "error_rate": (len(samples) - len(ok)) / len(samples) if samples else 0.0,
+        "errors": errors,
+        "latency_s": percentiles(latencies),
+        "histogram": histogram(latencies),
+        "stages_s": stages,
+    }
+
+@asynccontextmanager
+async def make_client(base_url: str, max_connections: int, mock_corpus_size: int = None):
+    """
+    Pooled HTTP client against `base_url`, or, when `mock_corpus_size` is set, against
+    the app in-process with MockLLM and an offline index of that many synthetic claims.
+    """
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    if mock_corpus_size is None:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=REQUEST_TIMEOUT) as client:
+            yield client
+        return
+
+    from benchmarks.run_benchmarks import make_store, mock_backend
+    from data_gen.generate_synthetic_claims import generate_claims
+    from etl.processor import ClaimProcessor
+
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = generate_claims(num_rows=mock_corpus_size, output=os.path.join(workdir, "claims.csv"))[0]
+        processor = ClaimProcessor()
+        store = make_store("hash", workdir)
+        store.create_index(processor.process_records(processor.load_csv(csv_path)))
+        with mock_backend(store) as app:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", limits=limits,
+                                         timeout=REQUEST_TIMEOUT) as client:
+                yield client
+
+async def run_load_test(queries: list, base_url: str = BASE_URL, k: int = 5, concurrency: int = DEFAULT_CONCURRENCY,
+                        rps: float = None, num_requests: int = DEFAULT_REQUESTS, duration: float = None,
+                        mock_corpus_size: int = None) -> dict:
+    """
+    Replays `queries` against /query and returns the summary.
+    With `rps` set the load is open-loop (fixed arrival rate, at most `concurrency`
+    in flight); otherwise it is closed-loop with `concurrency` virtual users.
+    Stops after `duration` seconds if given, else after `num_requests` requests.
+    """
+    async with make_client(base_url, concurrency, mock_corpus_size) as client:
+        start = time.perf_counter()
+        if rps:
+            samples = await run_open_loop(client, queries, k, rps, concurrency, num_requests, duration)
+        else:
+            samples = await run_closed_loop(client, queries, k, concurrency, num_requests, duration)
+        elapsed = time.perf_counter() - start
+    return summarize(samples, elapsed)
+
+def print_summary(summary: dict):
+    print(f"\nRequests: {summary['requests']} in {summary['elapsed_s']:.1f}s")
+    print(f"Throughput: {summary['throughput_rps']:.1f} req/s")
+    print(f"Error rate: {summary['error_rate']:.2%} {summary['errors'] or ''}")
+
+    latency = summary["latency_s"]
+    if latency:
+        print("Latency: " + "  ".join(f"{name}={value * 1000:.1f}ms" for name, value in latency.items()))
+
+    counts = [count for _, count in summary["histogram"]]
+    peak = max(counts) if counts else 0
+    lower = 0.0
+    for bound, count in summary["histogram"]:
+        label = f"{lower * 1000:7.0f}-{bound * 1000:.0f}ms" if bound else f"{lower * 1000:7.0f}ms+"
+        bar = "#" * int(40 * count / peak) if peak else ""
+        print(f"  {label:>16} | {bar} {count}")
+        lower = bound or lower
+
+    if summary["stages_s"]:
+        print("Per-stage (server-reported):")
+        for name, stats in summary["stages_s"].items():
+            print(f"  {name:18} " + "  ".join(f"{p}={stats[p] * 1000:.1f}ms" for p in ["p50", "p95", "p99"]))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the /query endpoint.")
+    parser.add_argument("--url", default=BASE_URL, help="Backend base URL")
+    parser.add_argument("-w", "--workload", help="Query workload (JSONL from generate_query_workload.py, or text)")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Virtual users (closed loop), or max in-flight requests with --rps")
+    parser.add_argument("--rps", type=float, help="Target arrival rate; switches to open-loop mode")
+    parser.add_argument("-n", "--num-requests", type=int, default=DEFAULT_REQUESTS, help="Total requests")
+    parser.add_argument("-d", "--duration", type=float, help="Run for this many seconds instead of -n")
+    parser.add_argument("-k", type=int, default=5, help="Documents retrieved per query")
+    parser.add_argument("--mock", type=int, metavar="CORPUS_SIZE", nargs="?", const=2000,
+                        help="Run offline against the in-process app with MockLLM and a synthetic index")
+    parser.add_argument("-o", "--output", help="Write the summary as JSON")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    summary = asyncio.run(run_load_test(
+        load_queries(args.workload),
+        base_url=args.url,
+        k=args.k,
+        concurrency=args.concurrency,
+        rps=args.rps,
+        num_requests=args.num_requests,
+        duration=args.duration,
+        mock_corpus_size=args.mock,
+    ))
+    print_summary(summary)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Summary saved to {args.output}")
@@ -0,0 +1,256 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Add parent directory to path to import sibling modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_gen.generate_synthetic_claims import generate_claims
+from etl.processor import ClaimProcessor
+from indexing.vector_store import VectorStore
+
+# Configuration
+DEFAULT_SIZES = [1000, 10000, 50000]
+DEFAULT_ROUNDS = 20
+DEFAULT_OUTPUT = os.path.join("benchmarks", "results", "latest.json")
+REGRESSION_THRESHOLD = 0.2  # Flag a benchmark when its median slows down by more than 20%
+MIN_DELTA_SECONDS = 0.0005  # ...and by more than this, so timer noise on tiny timings is ignored
+
+SEARCH_QUERIES = [
+    "denied claims for medical necessity",
+    "cardiology claims with high amounts",
+    "patient presented with symptoms of asthma",
+    "pending orthopedics fracture claims",
+]
+FILTERS = {"status": "Denied"}
+API_QUERIES = [
+    "Show me denied claims",
+    "Which claims were for Atrial Fibrillation?",
+    "List all approved claims",
+    "Show me claims for patients with Migraine",
+]
+
+class HashingEncoder:
+    """
+    Offline stand-in for SentenceTransformer: hashes tokens into a fixed-size
+    normalized vector. Lets the index/search/persistence paths be benchmarked
+    without downloading a model; encoding cost is not representative.
+    """
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    def encode(self, texts, show_progress_bar: bool = False):
+        vectors = np.zeros((len(texts), self.dimension), dtype='float32')
+        for i, text in enumerate(texts):
+            for token in text.lower().split():
+                vectors[i, zlib.crc32(token.encode()) % self.dimension] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+def measure(fn, rounds: int, warmup: int = 1, items: int = None) -> dict:
+    """Runs `fn` `warmup + rounds` times and summarizes the timed rounds."""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings)
+    stats = {
+        "median_s": float(np.median(timings)),
+        "p95_s": float(np.percentile(timings, 95)),
+        "mean_s": float(timings.mean()),
+        "min_s": float(timings.min()),
+        "rounds": rounds,
+    }
+    if items:
+        stats["items_per_s"] = items / stats["median_s"]
+    return stats
+
+def make_store(encoder: str, workdir: str) -> VectorStore:
+    store = VectorStore(
+        index_file=os.path.join(workdir, "faiss.index"),
+        metadata_file=os.path.join(workdir, "metadata.pkl"),
+    )
+    if encoder == "hash":
+        store.model = HashingEncoder()
+    else:
+        store.model_name = encoder
+    return store
+
+def bench_size(size: int, rounds: int, encoder: str, workdir: str) -> dict:
+    results = {}
+    csv_path = generate_claims(num_rows=size, output=os.path.join(workdir, f"claims-{size}.csv"), seed=size)[0]
+    processor = ClaimProcessor()
+
+    results["etl.load_csv"] = measure(lambda: processor.load_csv(csv_path), rounds=max(1, rounds // 4), items=size)
+    records = processor.load_csv(csv_path)
+    results["etl.process_records"] = measure(lambda: processor.process_records(records), rounds=max(1, rounds // 4), items=size)
+    documents = processor.process_records(records)
+
+    store = make_store(encoder, workdir)
+    store.load_model()
+    results["index.create_index"] = measure(lambda: store.create_index(documents), rounds=1, warmup=0, items=len(documents))
+
+    queries = iter(SEARCH_QUERIES * rounds * 2)
+    results["search.unfiltered"] = measure(lambda: store.search(next(queries), k=5), rounds=rounds)
+    results["search.filtered"] = measure(lambda: store.search(next(queries), k=5, filters=FILTERS), rounds=rounds)
+
+    results["index.save_index"] = measure(store.save_index, rounds=max(1, rounds // 4))
+    reloaded = make_store(encoder, workdir)
+    results["index.load_index"] = measure(lambda: reloaded.load_index(lazy=False), rounds=max(1, rounds // 4))
+
+    results["api.query"] = bench_query_endpoint(store, rounds)
+    return results
+
+@contextmanager
+def mock_backend(store: VectorStore):
+    """Points the FastAPI app at `store` with MockLLM for the duration of the block."""
+    import backend.main as main
+    from backend.llm import MockLLM
+
+    saved = (main.vector_store, main.llm, main.settings.LLM_TYPE)
+    main.vector_store, main.llm, main.settings.LLM_TYPE = store, MockLLM(), "mock"
+    try:
+        yield main.app
+    finally:
+        main.vector_store, main.llm, main.settings.LLM_TYPE = saved
+
+def bench_query_endpoint(store: VectorStore, rounds: int) -> dict:
+    """Full /query round trip through FastAPI with MockLLM, against the given store."""
+    from fastapi.testclient import TestClient
+
+    with mock_backend(store) as app:
+        client = TestClient(app)
+        queries = iter(API_QUERIES * (rounds + 1))
+
+        def run_query():
+            response = client.post("/query", json={"query": next(queries), "k": 5})
+            response.raise_for_status()
+
+        return measure(run_query, rounds=rounds)
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+def run_suite(sizes: list, rounds: int = DEFAULT_ROUNDS, encoder: str = "hash") -> dict:
+    """Runs every benchmark at every corpus size. Keys are '<benchmark>[n=<size>]'."""
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            print(f"Benchmarking corpus size {size}...")
+            for name, stats in bench_size(size, rounds, encoder, workdir).items():
+                results[f"{name}[n={size}]"] = stats
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "encoder": encoder,
+            "sizes": sizes,
+            "rounds": rounds,
+        },
+        "results": results,
+    }
+
+def compare(baseline: dict, current: dict, threshold: float = REGRESSION_THRESHOLD,
+            min_delta: float = MIN_DELTA_SECONDS) -> list:
+    """
+    Compares median timings of two result files.
+    Returns one row per benchmark present in both, with `regression` set when the
+    current median is slower by more than `threshold` (relative) and `min_delta` (absolute).
+    """
+    rows = []
+    for name, base_stats in baseline["results"].items():
+        if name not in current["results"]:
+            continue
+        base = base_stats["median_s"]
+        curr = current["results"][name]["median_s"]
+        change = (curr - base) / base if base > 0 else 0.0
+        rows.append({
+            "name": name,
+            "baseline_s": base,
+            "current_s": curr,
+            "change": change,
+            "regression": change > threshold and (curr - base) > min_delta,
+        })
+    return rows
+
+def print_results(report: dict):
+    print(f"{'benchmark':45} {'median':>12} {'p95':>12} {'items/s':>12}")
+    for name, stats in report["results"].items():
+        rate = f"{stats['items_per_s']:.0f}" if "items_per_s" in stats else "-"
+        print(f"{name:45} {stats['median_s'] * 1000:10.3f}ms {stats['p95_s'] * 1000:10.3f}ms {rate:>12}")
+
+def print_comparison(rows: list):
+    print(f"{'benchmark':45} {'baseline':>12} {'current':>12} {'change':>8}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['name']:45} {row['baseline_s'] * 1000:10.3f}ms {row['current_s'] * 1000:10.3f}ms {row['change']:+8.1%}{flag}")
+
+def load_report(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Performance benchmarks and regression checks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Run the benchmark suite and write a JSON report")
+    run.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Corpus sizes (claims)")
+    run.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="Timed rounds per latency benchmark")
+    run.add_argument("--encoder", default="hash",
+                     help="'hash' for the offline stand-in, or a SentenceTransformer model name")
+    run.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help="Report path")
+    run.add_argument("--baseline", help="Compare against this report after running")
+    run.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+
+    cmp = sub.add_parser("compare", help="Compare two reports and flag regressions")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.command == "run":
+        current = run_suite(args.sizes, args.rounds, args.encoder)
+        if os.path.dirname(args.output) and not os.path.exists(os.path.dirname(args.output)):
+            os.makedirs(os.path.dirname(args.output))
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+        print_results(current)
+        print(f"Results saved to {args.output}")
+        baseline_path = args.baseline
+    else:
+        current = load_report(args.current)
+        baseline_path = args.baseline
+
+    if not baseline_path:
+        return 0
+    rows = compare(load_report(baseline_path), current, args.threshold)
+    print_comparison(rows)
+    regressions = [r for r in rows if r["regression"]]
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}.")
+        return 1
+    print("No regressions.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
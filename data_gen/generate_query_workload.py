@@ -0,0 +1,179 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import random
+from collections import Counter
+
+import numpy as np
+
+# Configuration
+NUM_QUERIES = 500
+INPUT_GLOB = os.path.join("sample_data", "claims*.csv")
+OUTPUT_FILE = os.path.join("sample_data", "queries.jsonl")
+DEFAULT_SEED = 42
+LOOKUP_POOL_SIZE = 10_000  # Reservoir of claims sampled for ID lookup queries
+
+# Query mix: type -> share of the workload
+QUERY_MIX = {
+    "lookup": 0.25,
+    "status": 0.2,
+    "status_specialty": 0.2,
+    "diagnosis": 0.2,
+    "year": 0.15,
+}
+
+TEMPLATES = {
+    "lookup": ["Details for claim {claim_id}", "What is the status of claim {claim_id}?"],
+    "status": ["Show me {status_lower} claims", "List all {status_lower} claims"],
+    "status_specialty": ["Show me {status_lower} {specialty_lower} claims", "Which {specialty} claims were {status_lower}?"],
+    "diagnosis": ["Which claims were for {diagnosis}?", "Show me claims for patients with {diagnosis}"],
+    "year": ["Show me claims from {year}", "List claims submitted in {year}"],
+}
+
+def iter_claims(paths: list, batch_size: int = 100_000):
+    """Yields claims as dicts from CSV or Parquet files without loading a whole file."""
+    for path in paths:
+        if path.endswith(".parquet"):
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("pyarrow package not found. Install it to read Parquet input.")
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+                yield from batch.to_pylist()
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                yield from csv.DictReader(f)
+
+def profile_corpus(paths: list, seed: int = DEFAULT_SEED, pool_size: int = LOOKUP_POOL_SIZE) -> dict:
+    """
+    Single streaming pass over the corpus that collects the counts needed to label
+    queries, plus a uniform reservoir sample of claims for lookup queries.
+    """
+    counts = {"status": Counter(), "status_specialty": Counter(), "diagnosis": Counter(), "year": Counter()}
+    pool = []
+    seen = 0
+    # Scalar draws per row are far cheaper with the stdlib RNG than with NumPy
+    reservoir_rng = random.Random(seed)
+    for row in iter_claims(paths):
+        counts["status"][row["status"]] += 1
+        counts["status_specialty"][(row["status"], row["specialty"])] += 1
+        counts["diagnosis"][row["diagnosis"]] += 1
+        counts["year"][str(row["claim_date"])[:4]] += 1
+
+        if len(pool) < pool_size:
+            pool.append(row)
+        else:
+            j = reservoir_rng.randrange(seen + 1)
+            if j < pool_size:
+                pool[j] = row
+        seen += 1
+    return {"counts": counts, "lookup_pool": pool, "num_claims": seen}
+
+def make_query(query_type: str, key, rng: np.random.Generator) -> dict:
+    """
+    Builds one labelled query.
+    `expected_filters` uses the same keys as VectorStore.search filters, so it can
+    grade filter extraction; `relevant_if` is the metadata predicate a retrieved
+    claim must satisfy to count as relevant.
+    """
+    if query_type == "lookup":
+        fields = {"claim_id": key["claim_id"]}
+        expected_filters = {"claim_id": key["claim_id"]}
+        relevant_if = dict(expected_filters)
+    elif query_type == "status":
+        fields = {"status": key}
+        expected_filters = {"status": key}
+        relevant_if = dict(expected_filters)
+    elif query_type == "status_specialty":
+        status, specialty = key
+        fields = {"status": status, "specialty": specialty}
+        expected_filters = {"status": status, "specialty": specialty}
+        relevant_if = dict(expected_filters)
+    elif query_type == "diagnosis":
+        # Diagnosis is not a structured filter; this exercises pure semantic retrieval
+        fields = {"diagnosis": key}
+        expected_filters = {}
+        relevant_if = {"diagnosis": key}
+    elif query_type == "year":
+        fields = {"year": key}
+        expected_filters = {"start_date": f"{key}-01-01", "end_date": f"{key}-12-31"}
+        relevant_if = dict(expected_filters)
+    else:
+        raise ValueError(f"Unknown query type: {query_type}")
+
+    template = TEMPLATES[query_type][rng.integers(0, len(TEMPLATES[query_type]))]
+    text = template.format(
+        **fields,
+        **{f"{k}_lower": v.lower() for k, v in fields.items() if isinstance(v, str)},
+    )
+    return {
+        "query": text,
+        "type": query_type,
+        "expected_filters": expected_filters,
+        "relevant_if": relevant_if,
+    }
+
+def generate_workload(paths: list, num_queries: int = NUM_QUERIES, seed: int = DEFAULT_SEED) -> list:
+    """
+    Generates a labelled query workload for the given claims corpus.
+    Keys for aggregate queries are sampled in proportion to their frequency, so the
+    workload follows the corpus distribution the same way real traffic would.
+    """
+    rng = np.random.default_rng(seed)
+    profile = profile_corpus(paths, seed)
+    if profile["num_claims"] == 0:
+        raise ValueError("Claims corpus is empty.")
+    counts = profile["counts"]
+    pool = profile["lookup_pool"]
+
+    types = list(QUERY_MIX)
+    weights = np.array([QUERY_MIX[t] for t in types])
+    type_draws = rng.choice(len(types), size=num_queries, p=weights / weights.sum())
+
+    queries = []
+    for i, t in enumerate(type_draws):
+        query_type = types[t]
+        if query_type == "lookup":
+            key = pool[rng.integers(0, len(pool))]
+            num_relevant = 1
+        else:
+            keys = list(counts[query_type])
+            freq = np.array([counts[query_type][k] for k in keys], dtype=float)
+            key = keys[rng.choice(len(keys), p=freq / freq.sum())]
+            num_relevant = counts[query_type][key]
+
+        query = make_query(query_type, key, rng)
+        query["query_id"] = f"q-{i:06d}"
+        query["num_relevant"] = num_relevant
+        queries.append(query)
+    return queries
+
+def write_workload(queries: list, output: str):
+    if os.path.dirname(output) and not os.path.exists(os.path.dirname(output)):
+        os.makedirs(os.path.dirname(output))
+    with open(output, 'w', encoding='utf-8') as f:
+        for query in queries:
+            f.write(json.dumps(query) + "\n")
+
+def load_workload(path: str) -> list:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a labelled query workload from a claims corpus.")
+    parser.add_argument("-i", "--input", default=INPUT_GLOB, help="Claims file or glob (CSV or Parquet shards)")
+    parser.add_argument("-n", "--num-queries", type=int, default=NUM_QUERIES, help="Number of queries")
+    parser.add_argument("-o", "--output", default=OUTPUT_FILE, help="Output JSONL path")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Random seed for reproducible workloads")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    paths = sorted(glob.glob(args.input))
+    if not paths:
+        raise SystemExit(f"No claims files match {args.input}. Run generate_synthetic_claims.py first.")
+    queries = generate_workload(paths, args.num_queries, args.seed)
+    write_workload(queries, args.output)
+    print(f"Successfully generated {len(queries)} queries to {args.output}")
@@ -1,13 +1,18 @@
+import argparse
 import csv
-import random
-import uuid
-from datetime import datetime, timedelta
 import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 
 # Configuration
 NUM_CLAIMS = 2000
 OUTPUT_DIR = "sample_data"
 OUTPUT_FILE = os.path.join(OUTPUT_DIR, "claims.csv")
+DEFAULT_SEED = 42
+CHUNK_SIZE = 100_000  # Rows generated and written per step; bounds peak memory
 
 # Constants / Mock Data data
 SPECIALTIES = ["Cardiology", "Orthopedics", "Pediatrics", "Dermatology", "Oncology", "General Practice", "Neurology"]
@@ -22,93 +27,283 @@ DIAGNOSES = {
 }
 
 STATUSES = ["Approved", "Denied", "Pending"]
+STATUS_WEIGHTS = [0.6, 0.25, 0.15]
 DENIAL_REASONS = [
-    "Medical Necessity", "Prior Authorization Missing", "Duplicate Claim", 
+    "Medical Necessity", "Prior Authorization Missing", "Duplicate Claim",
     "Out of Network", "Coding Error", "Policy Terminated", "Experimental Treatment"
 ]
 
 DOCTOR_NAMES = [
-    "Dr. Smith", "Dr. Johnson", "Dr. Williams", "Dr. Brown", "Dr. Jones", 
+    "Dr. Smith", "Dr. Johnson", "Dr. Williams", "Dr. Brown", "Dr. Jones",
     "Dr. Garcia", "Dr. Miller", "Dr. Davis", "Dr. Rodriguez", "Dr. Martinez",
     "Dr. Hernandez", "Dr. Lopez", "Dr. Gonzalez", "Dr. Wilson", "Dr. Anderson"
 ]
 
+HEADERS = [
+    "claim_id", "patient_id", "doctor_id", "doctor_name", "specialty",
+    "diagnosis", "procedure_code", "claim_date", "amount",
+    "status", "denial_reason", "notes"
+]
+
+START_DATE = np.datetime64("2022-01-01")
+END_DATE = np.datetime64("2024-12-31")
+
+# Lookup tables so each column is a single fancy-index instead of per-row work.
+# Diagnoses are flattened; DIAGNOSIS_SPECIALTY maps each back to its specialty.
+DIAGNOSIS_NAMES = np.array([d for s in SPECIALTIES for d in DIAGNOSES[s]])
+DIAGNOSIS_SPECIALTY = np.array([i for i, s in enumerate(SPECIALTIES) for _ in DIAGNOSES[s]])
+SPECIALTY_NAMES = np.array(SPECIALTIES)
+STATUS_NAMES = np.array(STATUSES)
+REASON_NAMES = np.array([""] + DENIAL_REASONS)  # index 0 means "no denial reason"
+DOCTOR_NAME_ARR = np.array(DOCTOR_NAMES)
+# crc32 is stable across processes, unlike the builtin str hash
+DOCTOR_IDS = np.array([f"DR-{zlib.crc32(name.encode()) % 10000}" for name in DOCTOR_NAMES])
+
+HIGH_COST_SPECIALTIES = np.isin(SPECIALTY_NAMES, ["Cardiology", "Oncology", "Neurology"])
+MID_COST_SPECIALTIES = np.isin(SPECIALTY_NAMES, ["Orthopedics"])
+MEDICAL_NECESSITY_PRONE = np.isin(DIAGNOSIS_NAMES, ["Acne", "Flu"])
+
+# Every (diagnosis, status, reason) note, indexed as NOTES[diag, status, reason]
+NOTES = np.array([
+    [
+        [
+            f"Patient presented with symptoms of {diag}. {status}."
+            + (f" Claim denied due to {reason}." if status == "Denied" else "")
+            for reason in REASON_NAMES
+        ]
+        for status in STATUSES
+    ]
+    for diag in DIAGNOSIS_NAMES
+])
+
+# Extra sentences appended to notes with --long-notes, to exercise chunking.
+# Indexed as NOTE_DETAILS[diag, sentence]; about half mention the diagnosis.
+NOTE_DETAIL_TEMPLATES = [
+    "Vital signs were recorded and reviewed with the patient.",
+    "Treatment plan for {diag} was discussed in detail.",
+    "The patient reported the symptoms began about two weeks ago.",
+    "Prior records related to {diag} were requested from the referring provider.",
+    "Medication history was reconciled and no interactions were found.",
+    "Lab results were consistent with {diag}.",
+    "The patient was advised to return if symptoms worsen.",
+    "A follow-up visit was scheduled in four weeks to reassess {diag}.",
+    "Insurance eligibility was verified at check-in.",
+    "Patient education materials on {diag} were provided.",
+    "No known drug allergies were reported.",
+    "Imaging was ordered to rule out complications of {diag}.",
+    "The attending physician reviewed and signed the encounter note.",
+    "Family history was noncontributory.",
+    "Referral to a specialist for {diag} management was considered.",
+    "The patient verbalized understanding of the care plan.",
+]
+NOTE_DETAILS = np.array([[t.format(diag=diag) for t in NOTE_DETAIL_TEMPLATES] for diag in DIAGNOSIS_NAMES], dtype=object)
+LONG_NOTE_SENTENCES = (10, 60)  # Inclusive range of extra sentences per long note
+
+HEX_DIGITS = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)
+NIBBLE_SHIFTS = np.arange(28, -1, -4, dtype=np.uint64)
+ID_MULTIPLIER = np.uint64(0x9E3779B1)  # odd, so multiplication mod 2**32 is a bijection
+ID_MASK = np.uint64(0xFFFFFFFF)
+
 def ensure_dir(directory):
-    if not os.path.exists(directory):
+    if directory and not os.path.exists(directory):
         os.makedirs(directory)
 
-def generate_date(start_year=2022, end_year=2024):
-    start = datetime(start_year, 1, 1)
-    end = datetime(end_year, 12, 31)
-    return start + timedelta(days=random.randint(0, (end - start).days))
-
-def generate_claims():
-    ensure_dir(OUTPUT_DIR)
-    
-    headers = [
-        "claim_id", "patient_id", "doctor_id", "doctor_name", "specialty", 
-        "diagnosis", "procedure_code", "claim_date", "amount", 
-        "status", "denial_reason", "notes"
-    ]
-    
-    rows = []
-    
-    print(f"Generating {NUM_CLAIMS} synthetic claims...")
-    
-    for _ in range(NUM_CLAIMS):
-        claim_id = f"CLM-{uuid.uuid4().hex[:8].upper()}"
-        patient_id = f"P-{random.randint(10000, 99999)}"
-        
-        doctor_name = random.choice(DOCTOR_NAMES)
-        doctor_id = f"DR-{abs(hash(doctor_name)) % 10000}"
-        
-        specialty = random.choice(SPECIALTIES)
-        diagnosis = random.choice(DIAGNOSES[specialty])
-        
-        # Weighted status
-        status_roll = random.random()
-        if status_roll < 0.6:
-            status = "Approved"
-            denial_reason = ""
-        elif status_roll < 0.85:
-            status = "Denied"
-            denial_reason = random.choice(DENIAL_REASONS)
-            # Correlate reason slightly
-            if diagnosis in ["Acne", "Flu"] and random.random() < 0.3:
-                denial_reason = "Medical Necessity"
-        else:
-            status = "Pending"
-            denial_reason = ""
-            
-        claim_date = generate_date().strftime("%Y-%m-%d")
-        
-        # Amount logic
-        base_amount = random.randint(50, 500)
-        if specialty in ["Cardiology", "Oncology", "Neurology"]:
-            base_amount *= random.randint(5, 20)
-        elif specialty in ["Orthopedics"]:
-            base_amount *= random.randint(2, 10)
-            
-        amount = round(base_amount + random.random() * 100, 2)
-        
-        procedure_code = f"CPT-{random.randint(10000, 99999)}"
-        
-        notes = f"Patient presented with symptoms of {diagnosis}. {status}."
-        if status == "Denied":
-            notes += f" Claim denied due to {denial_reason}."
-            
-        rows.append([
-            claim_id, patient_id, doctor_id, doctor_name, specialty,
-            diagnosis, procedure_code, claim_date, amount,
-            status, denial_reason, notes
-        ])
-        
-    with open(OUTPUT_FILE, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(headers)
-        writer.writerows(rows)
-        
-    print(f"Successfully generated {NUM_CLAIMS} claims to {OUTPUT_FILE}")
+def _hex8(values: np.ndarray) -> np.ndarray:
+    """Formats uint32 values as 8-character uppercase hex strings without a Python loop."""
+    nibbles = (values[:, None] >> NIBBLE_SHIFTS) & np.uint64(0xF)
+    return HEX_DIGITS[nibbles].view("S8").ravel().astype("U8")
+
+def make_claim_ids(row_offsets: np.ndarray, seed: int) -> np.ndarray:
+    """
+    Scrambles global row numbers into random-looking claim IDs.
+    The mapping is a bijection on 32 bits, so IDs are unique across chunks and
+    shards for up to 4 billion rows with no coordination between workers.
+    """
+    salt = np.uint64(zlib.crc32(str(seed).encode()))
+    scrambled = ((row_offsets.astype(np.uint64) * ID_MULTIPLIER) & ID_MASK) ^ salt
+    return np.char.add("CLM-", _hex8(scrambled))
+
+def make_long_notes(rng: np.random.Generator, notes: np.ndarray, diag_idx: np.ndarray) -> np.ndarray:
+    """Appends a random run of detail sentences to each note."""
+    low, high = LONG_NOTE_SENTENCES
+    counts = rng.integers(low, high + 1, len(notes))
+    picks = rng.integers(0, len(NOTE_DETAIL_TEMPLATES), (len(notes), high))
+    details = NOTE_DETAILS[diag_idx[:, None], picks]
+    return np.array([
+        " ".join([note, *row[:count]]) for note, row, count in zip(notes.tolist(), details, counts.tolist())
+    ], dtype=object)
+
+def generate_chunk(rng: np.random.Generator, row_offset: int, n: int, seed: int = DEFAULT_SEED,
+                   long_notes: bool = False) -> dict:
+    """
+    Generates `n` claims as a dict of column arrays, in HEADERS order.
+    `row_offset` is the global index of the first row and only affects claim IDs.
+    `long_notes` appends 10-60 extra sentences to each note; it draws from `rng`
+    last, so the other columns match a run without it.
+    """
+    claim_ids = make_claim_ids(np.arange(row_offset, row_offset + n), seed)
+    patient_ids = np.char.add("P-", rng.integers(10000, 100000, n).astype("U5"))
+
+    doctor_idx = rng.integers(0, len(DOCTOR_NAMES), n)
+    diag_idx = rng.integers(0, len(DIAGNOSIS_NAMES), n)
+    spec_idx = DIAGNOSIS_SPECIALTY[diag_idx]
+
+    # Weighted status, with denial reasons correlated to diagnosis
+    status_idx = rng.choice(len(STATUSES), size=n, p=STATUS_WEIGHTS)
+    denied = status_idx == STATUSES.index("Denied")
+    reason_idx = np.where(denied, rng.integers(1, len(REASON_NAMES), n), 0)
+    force_necessity = denied & MEDICAL_NECESSITY_PRONE[diag_idx] & (rng.random(n) < 0.3)
+    reason_idx[force_necessity] = 1 + DENIAL_REASONS.index("Medical Necessity")
+
+    day_offsets = rng.integers(0, (END_DATE - START_DATE).astype(int) + 1, n)
+    claim_dates = (START_DATE + day_offsets).astype("U10")
+
+    # Amount logic
+    base_amount = rng.integers(50, 501, n)
+    multiplier = np.ones(n, dtype=np.int64)
+    high = HIGH_COST_SPECIALTIES[spec_idx]
+    mid = MID_COST_SPECIALTIES[spec_idx]
+    multiplier[high] = rng.integers(5, 21, int(high.sum()))
+    multiplier[mid] = rng.integers(2, 11, int(mid.sum()))
+    amounts = np.round(base_amount * multiplier + rng.random(n) * 100, 2)
+
+    procedure_codes = np.char.add("CPT-", rng.integers(10000, 100000, n).astype("U5"))
+
+    notes = NOTES[diag_idx, status_idx, reason_idx]
+    if long_notes:
+        notes = make_long_notes(rng, notes, diag_idx)
+
+    return {
+        "claim_id": claim_ids,
+        "patient_id": patient_ids,
+        "doctor_id": DOCTOR_IDS[doctor_idx],
+        "doctor_name": DOCTOR_NAME_ARR[doctor_idx],
+        "specialty": SPECIALTY_NAMES[spec_idx],
+        "diagnosis": DIAGNOSIS_NAMES[diag_idx],
+        "procedure_code": procedure_codes,
+        "claim_date": claim_dates,
+        "amount": amounts,
+        "status": STATUS_NAMES[status_idx],
+        "denial_reason": REASON_NAMES[reason_idx],
+        "notes": notes,
+    }
+
+class CSVChunkWriter:
+    def __init__(self, path: str):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(HEADERS)
+
+    def write(self, columns: dict):
+        self.writer.writerows(zip(*(columns[h].tolist() for h in HEADERS)))
+
+    def close(self):
+        self.file.close()
+
+class ParquetChunkWriter:
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow package not found. Install it to write Parquet output.")
+        self.pa = pa
+        self.schema = pa.schema([(h, pa.float64() if h == "amount" else pa.string()) for h in HEADERS])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, columns: dict):
+        arrays = [self.pa.array(columns[h]) for h in HEADERS]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+WRITERS = {"csv": CSVChunkWriter, "parquet": ParquetChunkWriter}
+
+def write_claims(path: str, num_rows: int, seed_seq: np.random.SeedSequence, row_offset: int = 0,
+                 fmt: str = "csv", chunk_size: int = CHUNK_SIZE, seed: int = DEFAULT_SEED,
+                 long_notes: bool = False) -> int:
+    """Streams `num_rows` claims to `path`, one chunk at a time."""
+    rng = np.random.default_rng(seed_seq)
+    writer = WRITERS[fmt](path)
+    try:
+        written = 0
+        while written < num_rows:
+            n = min(chunk_size, num_rows - written)
+            writer.write(generate_chunk(rng, row_offset + written, n, seed, long_notes))
+            written += n
+    finally:
+        writer.close()
+    return written
+
+def _write_shard(job: tuple) -> str:
+    path, num_rows, seed_seq, row_offset, fmt, chunk_size, seed, long_notes = job
+    write_claims(path, num_rows, seed_seq, row_offset, fmt, chunk_size, seed, long_notes)
+    return path
+
+def shard_paths(output: str, num_shards: int) -> list:
+    """claims.csv -> claims-00000-of-00004.csv, ...; unchanged for a single shard."""
+    if num_shards == 1:
+        return [output]
+    root, ext = os.path.splitext(output)
+    return [f"{root}-{i:05d}-of-{num_shards:05d}{ext}" for i in range(num_shards)]
+
+def generate_claims(num_rows: int = NUM_CLAIMS, output: str = OUTPUT_FILE, seed: int = DEFAULT_SEED,
+                    fmt: str = None, shards: int = 1, workers: int = 1, chunk_size: int = CHUNK_SIZE,
+                    long_notes: bool = False) -> list:
+    """
+    Generates a synthetic claims corpus and returns the written file paths.
+    Rows are split evenly across `shards` files, written by up to `workers` processes.
+    Output is identical for a given (num_rows, seed, shards, chunk_size) regardless of workers.
+    """
+    fmt = fmt or ("parquet" if output.endswith(".parquet") else "csv")
+    if fmt not in WRITERS:
+        raise ValueError(f"Unsupported format: {fmt}. Options: {', '.join(WRITERS)}")
+    ensure_dir(os.path.dirname(output))
+
+    paths = shard_paths(output, shards)
+    seed_seqs = np.random.SeedSequence(seed).spawn(shards)
+    base, extra = divmod(num_rows, shards)
+    jobs = []
+    offset = 0
+    for i, path in enumerate(paths):
+        rows = base + (1 if i < extra else 0)
+        jobs.append((path, rows, seed_seqs[i], offset, fmt, chunk_size, seed, long_notes))
+        offset += rows
+
+    print(f"Generating {num_rows} synthetic claims into {shards} {fmt} file(s)...")
+    start_time = time.time()
+    if workers > 1 and shards > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, shards)) as pool:
+            list(pool.map(_write_shard, jobs))
+    else:
+        for job in jobs:
+            _write_shard(job)
+
+    print(f"Successfully generated {num_rows} claims to {output} in {time.time() - start_time:.1f}s")
+    return paths
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic insurance claims corpus.")
+    parser.add_argument("-n", "--num-rows", type=int, default=NUM_CLAIMS, help="Total number of claims")
+    parser.add_argument("-o", "--output", default=OUTPUT_FILE, help="Output path; shards get a -NNNNN-of-NNNNN suffix")
+    parser.add_argument("--format", choices=sorted(WRITERS), help="Output format (default: from extension, else csv)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Random seed for reproducible corpora")
+    parser.add_argument("--shards", type=int, default=1, help="Number of output files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes used to write shards")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows generated per step (bounds memory)")
+    parser.add_argument("--long-notes", action="store_true", help="Multi-sentence notes that need chunking")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    generate_claims()
+    args = parse_args()
+    generate_claims(
+        num_rows=args.num_rows,
+        output=args.output,
+        seed=args.seed,
+        fmt=args.format,
+        shards=args.shards,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        long_notes=args.long_notes,
+    )
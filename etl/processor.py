@@ -1,11 +1,27 @@
 import csv
 import re
-from typing import List, Dict, Any
+import numpy as np
+from typing import List, Dict, Any, Callable, Optional
+
+# Sentence ends at . ! ? followed by whitespace, except after common title abbreviations ("dr. smith")
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])(?<!\bdr\.)(?<!\bmr\.)(?<!\bms\.)(?<!\bmrs\.)(?<!\bno\.)\s+")
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def count_tokens_approx(texts: List[str]) -> List[int]:
+    """Words and punctuation marks; a close lower bound for WordPiece-style tokenizers."""
+    return [len(TOKEN_PATTERN.findall(text)) for text in texts]
 
 class ClaimProcessor:
-    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50):
+    def __init__(self, chunk_size: int = 200, chunk_overlap: int = 30,
+                 token_counter: Optional[Callable[[List[str]], List[int]]] = None):
+        """
+        `chunk_size` and `chunk_overlap` are in tokens. `token_counter` maps a batch of
+        texts to their token counts; pass the embedding model's (see
+        VectorStore.token_counter) so chunks match what the model actually sees.
+        """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.token_counter = token_counter or count_tokens_approx
 
     def load_csv(self, filepath: str) -> List[Dict[str, Any]]:
         """Loads CSV data into a list of dictionaries."""
@@ -49,22 +65,87 @@ class ClaimProcessor:
         )
         return self.normalize_text(doc_text)
 
+    def split_sentences(self, text: str) -> List[str]:
+        return [s for s in SENTENCE_SPLIT.split(text) if s] or [text]
+
+    def _split_long_sentence(self, sentence: str, num_tokens: int) -> List[tuple]:
+        """
+        Breaks a sentence longer than chunk_size into word windows of at most chunk_size
+        tokens. Windows are sized from the average tokens per word, then re-counted in
+        one batched call; any that still overflow (rare or long words) are split again.
+        A single word over budget is kept whole.
+        """
+        words = sentence.split()
+        tokens_per_word = num_tokens / max(1, len(words))
+        window = max(1, int(self.chunk_size / tokens_per_word))
+        texts = [" ".join(words[i:i + window]) for i in range(0, len(words), window)]
+        pieces = []
+        for text, count in zip(texts, self.token_counter(texts)):
+            if count > self.chunk_size and " " in text:
+                pieces.extend(self._split_long_sentence(text, int(count)))
+            else:
+                pieces.append((text, int(count)))
+        return pieces
+
+    def _pack_sentences(self, sentences: List[str], lengths: np.ndarray) -> List[str]:
+        """
+        Greedily packs whole sentences into chunks of at most chunk_size tokens; each
+        chunk after the first repeats up to chunk_overlap tokens of trailing sentences.
+        """
+        pieces = []
+        for sentence, num_tokens in zip(sentences, lengths):
+            if num_tokens > self.chunk_size:
+                pieces.extend(self._split_long_sentence(sentence, int(num_tokens)))
+            else:
+                pieces.append((sentence, int(num_tokens)))
+
+        # cum[j] - cum[i] is the token count of pieces i..j-1
+        cum = np.concatenate([[0], np.cumsum([n for _, n in pieces])])
+        chunks = []
+        i = 0
+        while i < len(pieces):
+            j = max(i + 1, int(np.searchsorted(cum, cum[i] + self.chunk_size, side="right")) - 1)
+            chunks.append(" ".join(p for p, _ in pieces[i:j]))
+            if j >= len(pieces):
+                break
+            next_i = max(i + 1, int(np.searchsorted(cum, cum[j] - self.chunk_overlap, side="left")))
+            # If the overlapped window can't reach past j it would only repeat the previous
+            # chunk (the next piece is too long to share with an overlap): start fresh at j
+            if int(np.searchsorted(cum, cum[next_i] + self.chunk_size, side="right")) - 1 <= j:
+                next_i = j
+            i = next_i
+        return chunks
+
+    def chunk_texts(self, texts: List[str]) -> List[List[str]]:
+        """
+        Token-aware, sentence-boundary chunking for a batch of texts.
+        Token counts come from two batched token_counter calls: one over whole texts
+        to find the (usually few) that overflow chunk_size, and one over the
+        sentences of just those texts.
+        """
+        if not texts:
+            return []
+        totals = np.asarray(self.token_counter(texts))
+        chunks = [[text] for text in texts]
+        overflow = np.flatnonzero(totals > self.chunk_size)
+        if len(overflow) == 0:
+            return chunks
+
+        sentences = [self.split_sentences(texts[i]) for i in overflow]
+        lengths = np.asarray(self.token_counter([s for group in sentences for s in group]))
+        offsets = np.cumsum([0] + [len(group) for group in sentences])
+        for n, i in enumerate(overflow):
+            chunks[i] = self._pack_sentences(sentences[n], lengths[offsets[n]:offsets[n + 1]])
+        return chunks
+
     def process_records(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Processes records into documents for the vector store.
         Returns a list of dicts with 'id', 'text', 'metadata'.
         """
+        texts = [self.create_search_document(record) for record in records]
         processed_docs = []
-        for record in records:
-            text = self.create_search_document(record)
-            
-            # Simple chunking if text is too long (unlikely for this data, but good practice)
-            # This is a naive split; real production code might use nltk or langchain
-            if len(text) > self.chunk_size:
-                chunks = [text[i:i+self.chunk_size] for i in range(0, len(text), self.chunk_size - self.chunk_overlap)]
-            else:
-                chunks = [text]
-                
+        for record, chunks in zip(records, self.chunk_texts(texts)):
             for i, chunk in enumerate(chunks):
                 processed_docs.append({
                     "id": f"{record['claim_id']}_{i}",
@@ -1,7 +1,13 @@
+import hashlib
+import json
 import os
 import pickle
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
 import numpy as np
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple
 
 # Try to import FAISS and SentenceTransformer
 try:
@@ -13,14 +19,104 @@ except ImportError as e:
     faiss = None
     SentenceTransformer = None
 
+# Snapshot layout under index_dir:
+#   CURRENT                      -> name of the published snapshot, swapped atomically
+#   snapshots/<version>/         -> immutable; manifest.json + the files below
+SNAPSHOTS_DIR = "snapshots"
+CURRENT_POINTER = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+SNAPSHOT_FILES = {"index": "faiss.index", "embeddings": "embeddings.npy", "documents": "documents.pkl"}
+
+class SnapshotVerificationError(ValueError):
+    """A snapshot's files do not match the checksums in its manifest."""
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _fsync(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass  # Directories can't be fsynced on some platforms
+    finally:
+        os.close(fd)
+
+def _write_atomic(path: str, data: bytes):
+    """Readers see either the old or the new content, never a partial write."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync(os.path.dirname(os.path.abspath(path)))
+
+class IndexState(NamedTuple):
+    """
+    One generation of the served index. Never mutated: builds, loads and rollbacks
+    create a new one and swap it in with a single assignment, so a search that reads
+    the state once sees an index, documents and embeddings that belong together.
+    """
+    index: Any = None
+    documents: List[Dict[str, Any]] = [] # Parallel list to index integers
+    embeddings: Optional[np.ndarray] = None
+    version: Optional[str] = None # Snapshot this state was loaded from or published as
+    manifest: Optional[Dict[str, Any]] = None
+
+    def size(self) -> int:
+        if self.index is not None:
+            return self.index.ntotal
+        return len(self.embeddings) if self.embeddings is not None else 0
+
 class VectorStore:
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2", index_file: str = "faiss_index.bin", metadata_file: str = "metadata.pkl"):
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", index_file: str = "faiss_index.bin", metadata_file: str = "metadata.pkl",
+                 index_dir: str = None, keep_snapshots: int = 5):
+        """
+        `index_file`/`metadata_file` are the legacy single-pair layout, still read when
+        no snapshot has been published. New indexes are saved as versioned snapshots
+        under `index_dir` (default: the directory of `index_file`); the newest
+        `keep_snapshots` are retained for rollback.
+        """
         self.model_name = model_name
         self.index_file = index_file
         self.metadata_file = metadata_file
-        self.index = None
-        self.documents = [] # Parallel list to index integers
+        self.index_dir = index_dir or os.path.dirname(os.path.abspath(index_file))
+        self.snapshots_dir = os.path.join(self.index_dir, SNAPSHOTS_DIR)
+        self.keep_snapshots = keep_snapshots
         self.model = None
+        self.build_seconds = None
+        self._state = IndexState()
+        self._pending = None # Manifest of a snapshot selected but not yet read from disk
+        self._load_lock = threading.Lock() # Serializes state swaps; searches never take it once loaded
+
+    # Read-only views of the current state. Searches use one IndexState read instead.
+    @property
+    def index(self):
+        return self._state.index
+
+    @property
+    def documents(self) -> List[Dict[str, Any]]:
+        return self._state.documents
+
+    @property
+    def embeddings(self) -> Optional[np.ndarray]:
+        return self._state.embeddings
+
+    @property
+    def manifest(self) -> Optional[Dict[str, Any]]:
+        pending = self._pending
+        return pending if pending is not None else self._state.manifest
+
+    @property
+    def version(self) -> Optional[str]:
+        """Selected snapshot version (None if the in-memory index is unpublished)."""
+        manifest = self.manifest
+        return manifest["version"] if manifest is not None else None
 
     def load_model(self):
         if self.model is None:
@@ -29,37 +125,50 @@ class VectorStore:
                 raise ImportError("sentence-transformers not installed. Please pip install sentence-transformers.")
             self.model = SentenceTransformer(self.model_name)
 
+    def token_counter(self):
+        """
+        Batched token counter backed by the embedding model's tokenizer, for
+        ClaimProcessor. Returns None if the model exposes no tokenizer.
+        """
+        self.load_model()
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if tokenizer is None:
+            return None
+        return lambda texts: [len(ids) for ids in tokenizer(list(texts), add_special_tokens=False)["input_ids"]]
+
     def create_index(self, documents: List[Dict[str, Any]]):
         """
         Creates an index from a list of documents.
         Each document must have 'text' key.
         """
         self.load_model()
+        start_time = time.time()
         texts = [doc['text'] for doc in documents]
         print(f"Encoding {len(texts)} documents...")
-        embeddings = self.model.encode(texts, show_progress_bar=True)
-        
-        self.documents = documents
-        
         # Always keep numpy embeddings for filtered search fallback
-        self.embeddings = np.array(embeddings).astype('float32')
+        embeddings = np.array(self.model.encode(texts, show_progress_bar=True)).astype('float32')
 
         if faiss:
             # Initialize FAISS
             dimension = embeddings.shape[1]
-            self.index = faiss.IndexFlatL2(dimension)
-            self.index.add(self.embeddings)
-            print(f"Index created with FAISS ({self.index.ntotal} vectors).")
+            index = faiss.IndexFlatL2(dimension)
+            index.add(embeddings)
+            print(f"Index created with FAISS ({index.ntotal} vectors).")
         else:
-            print(f"Index created with Numpy Fallback ({len(self.embeddings)} vectors).")
+            index = None
+            print(f"Index created with Numpy Fallback ({len(embeddings)} vectors).")
+        
+        self.build_seconds = time.time() - start_time
+        with self._load_lock:
+            self._state, self._pending = IndexState(index, documents, embeddings), None
 
-    def _filter_documents(self, filters: Dict[str, Any]) -> List[int]:
+    def _filter_documents(self, documents: List[Dict[str, Any]], filters: Dict[str, Any]) -> List[int]:
         """Returns indices of documents that match the filters."""
         if not filters:
-            return list(range(len(self.documents)))
+            return list(range(len(documents)))
             
         indices = []
-        for i, doc in enumerate(self.documents):
+        for i, doc in enumerate(documents):
             meta = doc.get('metadata', {})
             match = True
             
@@ -84,42 +193,74 @@ class VectorStore:
         
         return indices
 
-    def search(self, query: str, k: int = 5, filters: Dict[str, Any] = None) -> List[Tuple[Dict[str, Any], float]]:
+    def search(self, query: str, k: int = 5, filters: Dict[str, Any] = None,
+               group_by: str = None, overfetch: int = 4) -> List[Tuple[Dict[str, Any], float]]:
         """
         Searches the index for the query. Returns list of (document, distance).
+        With `group_by` (e.g. 'claim_id'), returns only the best chunk per distinct
+        metadata value. Candidates are over-fetched (`overfetch` * k, doubling as
+        needed) so k groups are still returned when a claim has several close chunks.
         """
+        if k < 1:
+            return []
+        state = self._ensure_loaded()
         self.load_model()
-        query_vector = self.model.encode([query])
+        query_vector = np.array(self.model.encode([query])).astype('float32')
         
         # 1. Identify valid indices based on filters
-        valid_indices = self._filter_documents(filters or {})
+        valid_indices = self._filter_documents(state.documents, filters) if filters else None
+        
+        if not group_by:
+            return self._search_vectors(state, query_vector, k, valid_indices)
         
+        corpus_size = len(valid_indices) if valid_indices is not None else len(state.documents)
+        fetch = k * max(1, overfetch)
+        while True:
+            candidates = self._search_vectors(state, query_vector, fetch, valid_indices)
+            results = []
+            seen = set()
+            for doc, score in candidates:
+                key = doc.get('metadata', {}).get(group_by) or doc['id']
+                if key in seen:
+                    continue
+                seen.add(key)
+                results.append((doc, score))
+                if len(results) == k:
+                    return results
+            # Fewer candidates than asked for means the (filtered) corpus is exhausted
+            if len(candidates) < fetch or fetch >= corpus_size:
+                return results
+            fetch *= 2
+
+    def _search_vectors(self, state: IndexState, query_vector: np.ndarray, k: int,
+                        valid_indices: List[int] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """Top-k nearest documents in `state`, restricted to `valid_indices` when given."""
         # Optimization: If no filters, do standard FAISS search (fastest)
-        if (not filters) and self.index:
-             distances, indices = self.index.search(np.array(query_vector).astype('float32'), k)
+        if valid_indices is None and state.index:
+             distances, indices = state.index.search(query_vector, min(k, state.index.ntotal))
              results = []
              for i, idx in enumerate(indices[0]):
-                 if idx != -1 and idx < len(self.documents):
-                     results.append((self.documents[idx], float(distances[0][i])))
+                 if idx != -1 and idx < len(state.documents):
+                     results.append((state.documents[idx], float(distances[0][i])))
              return results
 
         # 2. Filtered Search (Manual)
         # If filters exist, we must search manually within the valid subset
         # because IndexFlatL2 doesn't support ID masking easily without IDMap.
+        if valid_indices is None:
+            valid_indices = list(range(len(state.documents)))
         
         if not valid_indices:
             return []
             
-        if not hasattr(self, 'embeddings') or self.embeddings is None:
+        if state.embeddings is None:
              raise ValueError("Index not initialized/loaded properly. Run /ingest again to enable filtering.")
         
-        q = np.array(query_vector).astype('float32')
-        
         # Create a subset of embeddings
-        subset_embeddings = self.embeddings[valid_indices]
+        subset_embeddings = state.embeddings[valid_indices]
         
         # Vectorized L2 distance on subset: sum((x-y)^2)
-        dists = np.sum((subset_embeddings - q)**2, axis=1)
+        dists = np.sum((subset_embeddings - query_vector)**2, axis=1)
         
         # Get top k indices relative to the subset
         # We need min(k, len(dists))
@@ -129,51 +270,237 @@ class VectorStore:
         results = []
         for idx in subset_top_k_idx:
             original_idx = valid_indices[idx]
-            results.append((self.documents[original_idx], float(dists[idx])))
+            results.append((state.documents[original_idx], float(dists[idx])))
             
         return results
 
-    def save_index(self):
-        # We need to save embeddings for filtered search support upon reload
-        # FAISS index saves structure, but we need the raw vectors if we want to do numpy filtering
-        # (Technically FAISS index has them, but `reconstruct` is slow/complex depending on index type).
-        # For this demo, simply pickling `embeddings` is easiest.
+    def size(self) -> int:
+        """Number of indexed vectors. Does not force a pending snapshot to load."""
+        pending = self._pending
+        if pending is not None:
+            return pending["num_vectors"]
+        return self._state.size()
+
+    def save_index(self) -> str:
+        """
+        Publishes the in-memory index as a new immutable snapshot and returns its version.
+        Files are written to a hidden temp directory, which is renamed into place once
+        complete; only then is CURRENT swapped to it. A crash at any point leaves
+        CURRENT on the previous, intact snapshot.
+        """
+        state = self._ensure_loaded()
+        if state.embeddings is None:
+            raise ValueError("No index to save. Run create_index first.")
         
-        data_to_save = {
-            "documents": self.documents,
-            "embeddings": self.embeddings if hasattr(self, 'embeddings') else None
+        version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        tmp_dir = os.path.join(self.snapshots_dir, f".tmp-{version}")
+        os.makedirs(tmp_dir)
+        
+        paths = {name: os.path.join(tmp_dir, filename) for name, filename in SNAPSHOT_FILES.items()}
+        # Raw vectors are kept for filtered search; stored as .npy so loads can memory-map them
+        np.save(paths["embeddings"], np.asarray(state.embeddings, dtype='float32'))
+        with open(paths["documents"], 'wb') as f:
+            pickle.dump(state.documents, f, protocol=pickle.HIGHEST_PROTOCOL)
+        if state.index is not None:
+            faiss.write_index(state.index, paths["index"])
+        
+        files = {}
+        for name, path in paths.items():
+            if os.path.exists(path):
+                _fsync(path)
+                files[name] = {"file": SNAPSHOT_FILES[name], "bytes": os.path.getsize(path), "sha256": _sha256(path)}
+        manifest = {
+            "version": version,
+            "model_name": self.model_name,
+            "num_documents": len(state.documents),
+            "num_vectors": state.size(),
+            "dimension": int(state.embeddings.shape[1]) if len(state.embeddings) else 0,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "build_seconds": self.build_seconds,
+            "files": files,
         }
+        _write_atomic(os.path.join(tmp_dir, MANIFEST_FILE), json.dumps(manifest, indent=2).encode())
         
-        with open(self.metadata_file, 'wb') as f:
-            pickle.dump(data_to_save, f)
-            
-        if self.index:
-            faiss.write_index(self.index, self.index_file)
-            
-        print(f"Index and metadata saved to {self.index_file} and {self.metadata_file}")
+        os.rename(tmp_dir, os.path.join(self.snapshots_dir, version))
+        _fsync(self.snapshots_dir)
+        _write_atomic(os.path.join(self.index_dir, CURRENT_POINTER), version.encode())
+        with self._load_lock:
+            # Tag the published state, unless a rebuild or rollback replaced it meanwhile
+            if self._state is state:
+                self._state = state._replace(version=version, manifest=manifest)
+        
+        self._prune_snapshots()
+        print(f"Published index snapshot {version} ({manifest['num_vectors']} vectors).")
+        return version
+
+    def current_version(self) -> str:
+        """Version named by the CURRENT pointer, or None if nothing is published."""
+        pointer = os.path.join(self.index_dir, CURRENT_POINTER)
+        if not os.path.exists(pointer):
+            return None
+        with open(pointer, 'r') as f:
+            return f.read().strip() or None
+
+    def _read_manifest(self, version: str) -> Dict[str, Any]:
+        """Reads a snapshot's manifest and checks that its files exist with the recorded sizes."""
+        snapshot_dir = os.path.join(self.snapshots_dir, version)
+        manifest_path = os.path.join(snapshot_dir, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            raise ValueError(f"Snapshot {version} not found or incomplete.")
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        for name, entry in manifest["files"].items():
+            path = os.path.join(snapshot_dir, entry["file"])
+            if not os.path.exists(path) or os.path.getsize(path) != entry["bytes"]:
+                raise ValueError(f"Snapshot {version} is damaged: {entry['file']} is missing or truncated.")
+        return manifest
+
+    def _select(self, version: str) -> Dict[str, Any]:
+        """Manifest of `version`, checked for completeness and a matching embedding model."""
+        manifest = self._read_manifest(version)
+        if manifest["model_name"] != self.model_name:
+            raise ValueError(
+                f"Snapshot {version} was built with {manifest['model_name']}, "
+                f"but the configured embedding model is {self.model_name}. Run /ingest to rebuild."
+            )
+        return manifest
+
+    def _read_snapshot(self, manifest: Dict[str, Any]):
+        """Verifies every file's checksum, then reads the snapshot into a new IndexState."""
+        snapshot_dir = os.path.join(self.snapshots_dir, manifest["version"])
+        for name, entry in manifest["files"].items():
+            if _sha256(os.path.join(snapshot_dir, entry["file"])) != entry["sha256"]:
+                raise SnapshotVerificationError(
+                    f"Snapshot {manifest['version']} failed verification: {entry['file']} checksum mismatch."
+                )
+        
+        embeddings = np.load(os.path.join(snapshot_dir, SNAPSHOT_FILES["embeddings"]), mmap_mode='r')
+        with open(os.path.join(snapshot_dir, SNAPSHOT_FILES["documents"]), 'rb') as f:
+            documents = pickle.load(f)
+        index = None
+        if faiss and "index" in manifest["files"]:
+            index = faiss.read_index(os.path.join(snapshot_dir, SNAPSHOT_FILES["index"]))
+        return IndexState(index, documents, embeddings, manifest["version"], manifest)
+
+    def load_index(self, version: str = None, lazy: bool = True):
+        """
+        Selects a snapshot (default: CURRENT) after validating its manifest and model.
+        With `lazy`, files are checksummed and read on first use rather than now, so
+        startup only costs a manifest read.
+        """
+        version = version or self.current_version()
+        if version is None:
+            self._load_legacy()
+            return
+        
+        manifest = self._select(version)
+        self._pending = manifest
+        print(f"Selected index snapshot {version} ({manifest['num_vectors']} vectors).")
+        if not lazy:
+            self._ensure_loaded()
+
+    def _ensure_loaded(self) -> IndexState:
+        """
+        Returns the current state, first reading the pending snapshot if there is one.
+        A snapshot that fails verification is dropped and the previous state kept, so
+        the store reports that state instead of failing every search. Other errors
+        (e.g. a transient I/O failure) keep the snapshot pending, so the next call retries.
+        """
+        if self._pending is None:
+            return self._state
+        with self._load_lock:
+            manifest = self._pending
+            if manifest is not None:
+                try:
+                    state = self._read_snapshot(manifest)
+                except SnapshotVerificationError:
+                    self._pending = None
+                    raise
+                self._state, self._pending = state, None
+                print(f"Loaded index snapshot {manifest['version']} ({manifest['num_vectors']} vectors).")
+            return self._state
+
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        """Manifests of all complete snapshots, oldest first, flagged with 'current'."""
+        if not os.path.isdir(self.snapshots_dir):
+            return []
+        current = self.current_version()
+        snapshots = []
+        for version in sorted(os.listdir(self.snapshots_dir)):
+            manifest_path = os.path.join(self.snapshots_dir, version, MANIFEST_FILE)
+            if version.startswith(".") or not os.path.exists(manifest_path):
+                continue
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+            manifest["current"] = version == current
+            snapshots.append(manifest)
+        return snapshots
+
+    def rollback(self, version: str = None) -> str:
+        """
+        Points CURRENT at `version` (default: the snapshot just before the current one)
+        and loads it. The target is fully verified and read before the pointer moves,
+        so a damaged snapshot leaves CURRENT and the serving index untouched.
+        """
+        versions = [m["version"] for m in self.list_snapshots()]
+        current = self.current_version()
+        if version is None:
+            older = [v for v in versions if current is None or v < current]
+            if not older:
+                raise ValueError("No earlier snapshot to roll back to.")
+            version = older[-1]
+        elif version not in versions:
+            raise ValueError(f"Snapshot {version} not found.")
+        
+        state = self._read_snapshot(self._select(version))
+        _write_atomic(os.path.join(self.index_dir, CURRENT_POINTER), version.encode())
+        with self._load_lock:
+            self._state, self._pending = state, None
+        print(f"Rolled back index to snapshot {version}.")
+        return version
+
+    def _prune_snapshots(self):
+        """
+        Keeps the newest `keep_snapshots` snapshots plus CURRENT, and clears temp dirs
+        left by crashed publishes (older than an hour, so a concurrent publish survives).
+        """
+        current = self.current_version()
+        versions = [m["version"] for m in self.list_snapshots()]
+        stale = versions[:-self.keep_snapshots] if self.keep_snapshots > 0 else versions
+        for version in stale:
+            if version != current:
+                shutil.rmtree(os.path.join(self.snapshots_dir, version), ignore_errors=True)
+        for name in os.listdir(self.snapshots_dir):
+            path = os.path.join(self.snapshots_dir, name)
+            if name.startswith(".tmp-") and time.time() - os.path.getmtime(path) > 3600:
+                shutil.rmtree(path, ignore_errors=True)
 
-    def load_index(self):
+    def _load_legacy(self):
         if os.path.exists(self.index_file) and os.path.exists(self.metadata_file):
-            self.index = faiss.read_index(self.index_file)
+            index = faiss.read_index(self.index_file)
             with open(self.metadata_file, 'rb') as f:
                 data = pickle.load(f)
                 
             # Handle migration from old format (list) to new format (dict)
             if isinstance(data, list):
-                self.documents = data
+                state = IndexState(index, data)
                 # No embeddings loaded, so filtering won't work until re-ingestion
                 print("WARNING: Loaded legacy index. Filtering will not work until you run /ingest.")
             else:
-                self.documents = data["documents"]
-                self.embeddings = data["embeddings"]
+                state = IndexState(index, data["documents"], data["embeddings"])
+            with self._load_lock:
+                self._state, self._pending = state, None
                 
-            print(f"Loaded index with {self.index.ntotal} vectors.")
+            print(f"Loaded index with {index.ntotal} vectors.")
         else:
             print("Index files not found.")
             
     def get_stats(self):
+        pending = self._pending
         return {
-            "total_documents": len(self.documents) if self.documents else 0,
+            "total_documents": pending["num_documents"] if pending is not None else len(self._state.documents),
             "model_name": self.model_name,
-            "backend": "FAISS (Local)"
+            "backend": "FAISS (Local)",
+            "version": self.version
         }
@@ -17,3 +17,11 @@ def test_ingest_no_file():
     pass
 
 # Integration test would go here
+
+def test_query_rejects_non_positive_k():
+    response = client.post("/query", json={"query": "show me denied claims", "k": 0})
+    assert response.status_code == 422
+
+def test_query_rejects_out_of_range_max_tokens():
+    response = client.post("/query", json={"query": "show me denied claims", "max_tokens": 0})
+    assert response.status_code == 422
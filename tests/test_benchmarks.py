@@ -0,0 +1,20 @@
+from benchmarks.run_benchmarks import compare, measure
+
+def report(**medians):
+    return {"results": {name: {"median_s": value} for name, value in medians.items()}}
+
+def test_measure_stats():
+    stats = measure(lambda: None, rounds=5, items=10)
+    assert stats["rounds"] == 5
+    assert stats["min_s"] <= stats["median_s"] <= stats["p95_s"]
+    assert stats["items_per_s"] > 0
+
+def test_compare_flags_regressions():
+    baseline = report(search=0.010, ingest=1.0, tiny=0.0001, removed=0.5)
+    current = report(search=0.020, ingest=1.05, tiny=0.0003)
+    rows = {row["name"]: row for row in compare(baseline, current, threshold=0.2)}
+    assert rows["search"]["regression"]
+    assert not rows["ingest"]["regression"]
+    # Large relative change but below the absolute noise floor
+    assert not rows["tiny"]["regression"]
+    assert "removed" not in rows
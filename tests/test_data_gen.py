@@ -0,0 +1,43 @@
+import csv
+import numpy as np
+from data_gen.generate_synthetic_claims import generate_chunk, generate_claims, HEADERS
+from data_gen.generate_query_workload import generate_workload
+
+def test_chunk_columns():
+    rng = np.random.default_rng(0)
+    chunk = generate_chunk(rng, 0, 1000)
+    assert list(chunk) == HEADERS
+    assert all(len(col) == 1000 for col in chunk.values())
+    assert chunk["claim_id"][0].startswith("CLM-") and len(chunk["claim_id"][0]) == 12
+    # Only denied claims carry a denial reason
+    denied = chunk["status"] == "Denied"
+    assert (chunk["denial_reason"][~denied] == "").all()
+    assert (chunk["denial_reason"][denied] != "").all()
+
+def test_sharded_output_is_reproducible(tmp_path):
+    paths = generate_claims(num_rows=1001, output=str(tmp_path / "a" / "claims.csv"), seed=7, shards=3, chunk_size=100)
+    again = generate_claims(num_rows=1001, output=str(tmp_path / "b" / "claims.csv"), seed=7, shards=3, chunk_size=100)
+    assert len(paths) == 3
+
+    rows = []
+    for path, other in zip(paths, again):
+        with open(path) as f, open(other) as g:
+            assert f.read() == g.read()
+        with open(path) as f:
+            rows.extend(csv.DictReader(f))
+    assert len(rows) == 1001
+    assert len({r["claim_id"] for r in rows}) == 1001
+
+def test_query_workload_labels(tmp_path):
+    paths = generate_claims(num_rows=500, output=str(tmp_path / "claims.csv"), seed=1)
+    with open(paths[0]) as f:
+        rows = list(csv.DictReader(f))
+    claim_ids = {r["claim_id"] for r in rows}
+
+    queries = generate_workload(paths, num_queries=50, seed=1)
+    assert len(queries) == 50
+    for q in queries:
+        if q["type"] == "lookup":
+            assert q["relevant_if"]["claim_id"] in claim_ids
+        elif q["type"] == "status":
+            assert q["num_relevant"] == sum(r["status"] == q["expected_filters"]["status"] for r in rows)
@@ -32,3 +32,44 @@ def test_processing():
     docs = processor.process_records(records)
     assert len(docs) == 2
     assert docs[0]["id"].startswith("1_")
+
+def test_sentence_chunking_respects_token_budget():
+    processor = ClaimProcessor(chunk_size=20, chunk_overlap=5)
+    sentences = [f"sentence number {i} talks about diagnosis details." for i in range(12)]
+    chunks = processor.chunk_texts([" ".join(sentences), "short text."])
+    assert chunks[1] == ["short text."]
+    long_chunks = chunks[0]
+    assert len(long_chunks) > 1
+    for chunk in long_chunks:
+        # Never cuts a sentence (or a word) in half
+        assert chunk.endswith(".")
+        assert processor.token_counter([chunk])[0] <= 20
+    # Every sentence survives chunking
+    joined = " ".join(long_chunks)
+    assert all(s in joined for s in sentences)
+
+def test_long_sentence_is_split_on_words():
+    processor = ClaimProcessor(chunk_size=10, chunk_overlap=0)
+    text = " ".join(f"word{i}" for i in range(35))
+    chunks = processor.chunk_texts([text])[0]
+    assert len(chunks) == 4
+    assert " ".join(chunks) == text
+
+def count_whitespace_tokens(texts):
+    return [len(text.split()) for text in texts]
+
+def test_overlap_never_emits_a_repeated_chunk():
+    processor = ClaimProcessor(chunk_size=20, chunk_overlap=5, token_counter=count_whitespace_tokens)
+    sentences = [" ".join(["a"] * 9) + " a.", "b b b b.", " ".join(["c"] * 17) + " c."]
+    chunks = processor.chunk_texts([" ".join(sentences)])[0]
+    assert chunks == [" ".join(sentences[:2]), sentences[2]]
+
+def test_long_sentence_windows_are_recounted():
+    # Long words cost several tokens each, so an average-based window overflows
+    def count_tokens(texts):
+        return [sum(5 if len(word) > 8 else 1 for word in text.split()) for text in texts]
+    processor = ClaimProcessor(chunk_size=20, chunk_overlap=0, token_counter=count_tokens)
+    text = " ".join(["x"] * 30 + ["pneumonoultramicroscopic"] * 10)
+    chunks = processor.chunk_texts([text])[0]
+    assert all(n <= 20 for n in count_tokens(chunks))
+    assert " ".join(chunks) == text
@@ -0,0 +1,167 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from backend.llm import BaseLLM, MockLLM
+from backend.llm_router import CircuitBreaker, LLMRouter, LLMUnavailableError
+
+CONTEXT = [{"text": "claim clm-1 submitted on 2024-01-01. status is denied."}]
+
+class FakeLLM(BaseLLM):
+    def __init__(self, answer="ok", delay=0.0, fail=False):
+        self.answer, self.delay, self.fail = answer, delay, fail
+        self.calls = 0
+
+    def generate_answer(self, query, context):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("provider error")
+        return self.answer
+
+def make_router(backends, **kwargs):
+    kwargs.setdefault("backoff_base", 0.0)
+    return LLMRouter(backends, **kwargs)
+
+def test_retries_then_falls_back():
+    primary = FakeLLM(fail=True)
+    router = make_router([("primary", primary), ("mock", MockLLM())], max_retries=2)
+    assert "MOCK ANSWER" in router.generate_answer("q", CONTEXT)
+    assert primary.calls == 3
+    assert router.get_stats()["primary"]["failures"] == 3
+
+def test_timeout_falls_back():
+    router = make_router([("slow", FakeLLM(delay=1.0)), ("fast", FakeLLM("fast"))], timeout=0.1, max_retries=0)
+    start = time.monotonic()
+    assert router.generate_answer("q", CONTEXT) == "fast"
+    assert time.monotonic() - start < 0.5
+    assert router.get_stats()["slow"]["timeouts"] == 1
+
+def test_local_backend_timeout_is_not_retried():
+    local = FakeLLM(delay=0.3)
+    local.retry_timeouts = False
+    router = make_router([("local", local), ("mock", MockLLM())], timeout=0.1, max_retries=2)
+    assert "MOCK ANSWER" in router.generate_answer("q", CONTEXT)
+    assert local.calls == 1
+
+def test_hedge_wins_after_delay():
+    router = make_router([("slow", FakeLLM("slow", delay=0.5)), ("hedge", FakeLLM("hedge"))], hedge_delay=0.05)
+    assert router.generate_answer("q", CONTEXT) == "hedge"
+    stats = router.get_stats()
+    assert stats["hedge"]["hedges"] == 1
+    assert stats["hedge"]["hedge_wins"] == 1
+
+def test_hedge_never_targets_mock():
+    router = make_router([("gemini", FakeLLM("real", delay=0.5)), ("mock", MockLLM())], hedge_delay=0.1)
+    assert router.generate_answer_with_backend("q", CONTEXT) == ("real", "gemini")
+    assert router.get_stats()["mock"]["hedges"] == 0
+
+def test_reports_backend_that_answered():
+    router = make_router([("primary", FakeLLM(fail=True)), ("mock", MockLLM())], max_retries=0)
+    answer, backend = router.generate_answer_with_backend("q", CONTEXT)
+    assert "MOCK ANSWER" in answer and backend == "mock"
+    assert MockLLM().generate_answer_with_backend("q", CONTEXT)[1] == "mock"
+
+class LimitedLLM(FakeLLM):
+    accepts_max_tokens = True
+
+    def generate_answer(self, query, context, max_tokens=None):
+        self.max_tokens = max_tokens
+        return super().generate_answer(query, context)
+
+def test_max_tokens_reaches_backends_that_accept_it():
+    limited = LimitedLLM("limited")
+    router = make_router([("limited", limited), ("mock", MockLLM())])
+    assert router.generate_answer("q", CONTEXT, max_tokens=42) == "limited"
+    assert limited.max_tokens == 42
+    assert "".join(router.stream_answer("q", CONTEXT, max_tokens=7)) == "limited"
+    assert limited.max_tokens == 7
+    # Backends without a per-request limit are called as before
+    router = make_router([("plain", FakeLLM("plain"))])
+    assert router.generate_answer("q", CONTEXT, max_tokens=42) == "plain"
+
+def test_circuit_opens_and_skips_backend():
+    primary = FakeLLM(fail=True)
+    router = make_router([("primary", primary), ("mock", MockLLM())], max_retries=0, breaker_threshold=2)
+    for _ in range(4):
+        router.generate_answer("q", CONTEXT)
+    assert primary.calls == 2
+    assert router.get_stats()["primary"]["circuit"] == "open"
+    assert router.get_stats()["primary"]["skipped_open"] == 2
+
+def test_breaker_half_open_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()  # Only one trial while half-open
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+def test_all_backends_fail():
+    router = make_router([("a", FakeLLM(fail=True))], max_retries=0)
+    with pytest.raises(LLMUnavailableError):
+        router.generate_answer("q", CONTEXT)
+
+def test_stream_falls_back_before_first_chunk():
+    router = make_router([("broken", FakeLLM(fail=True)), ("mock", MockLLM())])
+    assert "MOCK ANSWER" in "".join(router.stream_answer("q", CONTEXT))
+    assert router.get_stats()["broken"]["failures"] == 1
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible /chat/completions endpoint."""
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.delay)
+        if self.server.status != 200:
+            self.send_response(self.server.status)
+            self.end_headers()
+            return
+        body = json.dumps({
+            "id": "stub", "object": "chat.completion", "created": 0, "model": "stub",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": self.server.answer}}],
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub_server():
+    servers = []
+
+    def start(answer="stub answer", status=200, delay=0.0):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        server.answer, server.status, server.delay = answer, status, delay
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+def test_stub_servers_failover_and_hedge(stub_server):
+    pytest.importorskip("openai")
+    from backend.llm import OpenAILLM
+
+    broken = OpenAILLM(base_url=stub_server(status=503), timeout=2)
+    slow = OpenAILLM(base_url=stub_server("slow", delay=1.0), timeout=2)
+    healthy = OpenAILLM(base_url=stub_server("healthy"), timeout=2)
+
+    router = make_router([("broken", broken), ("healthy", healthy)], max_retries=1)
+    assert router.generate_answer("q", CONTEXT) == "healthy"
+    assert router.get_stats()["broken"]["failures"] == 2
+
+    router = make_router([("slow", slow), ("healthy", healthy)], hedge_delay=0.1)
+    start = time.monotonic()
+    assert router.generate_answer("q", CONTEXT) == "healthy"
+    assert time.monotonic() - start < 0.8
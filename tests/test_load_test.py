@@ -0,0 +1,21 @@
+import asyncio
+from benchmarks.load_test import run_load_test, summarize
+
+def test_mock_load_test():
+    queries = ["Show me denied claims", "Which claims were for Asthma?"]
+    summary = asyncio.run(run_load_test(queries, concurrency=4, num_requests=20, mock_corpus_size=200))
+    assert summary["requests"] == 20
+    assert summary["error_rate"] == 0.0
+    assert sum(count for _, count in summary["histogram"]) == 20
+    assert {"filter_extraction", "retrieval", "generation"} <= set(summary["stages_s"])
+
+def test_summarize_counts_errors():
+    samples = [
+        {"ok": True, "status": 200, "latency": 0.02, "stages": {"retrieval": 0.01}},
+        {"ok": False, "status": 500, "latency": 0.5, "stages": {}},
+        {"ok": False, "status": "ConnectTimeout", "latency": 1.0, "stages": {}},
+    ]
+    summary = summarize(samples, elapsed=1.0)
+    assert summary["error_rate"] == 2 / 3
+    assert summary["errors"] == {"500": 1, "ConnectTimeout": 1}
+    assert summary["latency_s"]["p50"] == 0.02
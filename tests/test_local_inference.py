@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+from backend.local_inference import LocalInferencePool, PoolOverloadedError
+
+class EchoModel:
+    """Stands in for GPT4All: streams the prompt's words back, one per token."""
+    def __init__(self, delay):
+        self.delay = delay
+
+    def generate(self, prompt, max_tokens, temp, streaming):
+        for word in prompt.split()[:max_tokens]:
+            time.sleep(self.delay)
+            yield word + " "
+
+def echo_model(model_name, n_threads):
+    return EchoModel(delay=0.0)
+
+def slow_echo_model(model_name, n_threads):
+    return EchoModel(delay=0.2)
+
+def broken_model(model_name, n_threads):
+    raise RuntimeError("no such model")
+
+def test_stream_and_token_limit():
+    pool = LocalInferencePool("echo", num_workers=2, max_tokens=3, model_factory=echo_model).start(load_timeout=60)
+    try:
+        assert list(pool.stream("a b")) == ["a ", "b "]
+        # Requests can lower the limit but never raise it above the pool's cap
+        assert pool.generate("a b c d e", max_tokens=2) == "a b "
+        assert pool.generate("a b c d e", max_tokens=100) == "a b c "
+        stats = pool.get_stats()
+        assert stats["completed"] == 3
+        assert stats["tokens"] == 7
+        assert stats["alive_workers"] == 2
+        assert stats["queued"] == 0 and stats["in_flight"] == 0
+        assert "p50" in stats["queue_wait_ms"]
+    finally:
+        pool.shutdown()
+
+def test_admission_control_rejects_when_full():
+    pool = LocalInferencePool("echo", num_workers=1, max_queue=1, model_factory=slow_echo_model).start(load_timeout=60)
+    try:
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(pool.generate("a b"))) for _ in range(2)]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        with pytest.raises(PoolOverloadedError):
+            pool.generate("a")
+        for t in threads:
+            t.join()
+        assert results == ["a b ", "a b "]
+        assert pool.get_stats()["rejected"] == 1
+    finally:
+        pool.shutdown()
+
+def test_load_failure_is_reported():
+    pool = LocalInferencePool("missing", num_workers=1, model_factory=broken_model)
+    with pytest.raises(RuntimeError, match="no such model"):
+        pool.start(load_timeout=60)
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.05)
+
+def test_abandoned_requests_are_cancelled():
+    pool = LocalInferencePool("echo", num_workers=1, max_queue=2, max_tokens=100, request_timeout=0.5,
+                              model_factory=slow_echo_model).start(load_timeout=60)
+    try:
+        # Running request: the worker stops between tokens once the caller times out
+        with pytest.raises(TimeoutError):
+            pool.generate("a b c d e f g h i j")
+        wait_for(lambda: pool.get_stats()["cancelled"] == 1)
+        # Stream dropped by its consumer after the first token (e.g. a client disconnect)
+        stream = pool.stream("a b c d e f g h i j")
+        assert next(stream) == "a "
+        stream.close()
+        wait_for(lambda: pool.get_stats()["cancelled"] == 2)
+        stats = pool.get_stats()
+        assert stats["queued"] == 0 and stats["in_flight"] == 0
+        assert stats["tokens"] == 0
+    finally:
+        pool.shutdown()
+
+def test_dead_worker_fails_request_and_is_replaced():
+    pool = LocalInferencePool("echo", num_workers=1, max_queue=0, model_factory=slow_echo_model,
+                              health_interval=0.05).start(load_timeout=60)
+    try:
+        results = []
+        def run():
+            try:
+                pool.generate("a b c d e f g h i j")
+            except RuntimeError as e:
+                results.append(str(e))
+        caller = threading.Thread(target=run)
+        caller.start()
+        wait_for(lambda: pool.get_stats()["in_flight"] == 1)
+        pool.processes[0].kill()
+        caller.join(timeout=10)
+        assert results and "died" in results[0]
+
+        wait_for(lambda: pool.get_stats()["alive_workers"] == 1)
+        # The slot was released, so the single-slot pool accepts work again
+        assert pool.generate("a b") == "a b "
+        stats = pool.get_stats()
+        assert stats["worker_restarts"] == 1
+        assert stats["queued"] == 0 and stats["in_flight"] == 0
+    finally:
+        pool.shutdown()
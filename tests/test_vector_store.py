@@ -0,0 +1,164 @@
+import threading
+
+import pytest
+from benchmarks.run_benchmarks import HashingEncoder
+from indexing.vector_store import SnapshotVerificationError, VectorStore
+
+def make_store(tmp_path):
+    store = VectorStore(index_file=str(tmp_path / "faiss.index"), metadata_file=str(tmp_path / "metadata.pkl"))
+    store.model = HashingEncoder()
+    # Claim A has many near-identical chunks that would crowd out everything else
+    docs = [{"id": f"A_{i}", "text": f"denied cardiology claim chunk {i}", "metadata": {"claim_id": "A", "status": "Denied"}}
+            for i in range(10)]
+    docs += [{"id": f"{c}_0", "text": f"denied cardiology claim {c}", "metadata": {"claim_id": c, "status": "Denied"}}
+             for c in "BCD"]
+    docs.append({"id": "E_0", "text": "approved dermatology claim", "metadata": {"claim_id": "E", "status": "Approved"}})
+    store.create_index(docs)
+    return store
+
+def test_group_by_claim(tmp_path):
+    store = make_store(tmp_path)
+    ungrouped = store.search("denied cardiology claim chunk", k=4)
+    assert {doc["metadata"]["claim_id"] for doc, _ in ungrouped} == {"A"}
+
+    grouped = store.search("denied cardiology claim chunk", k=4, group_by="claim_id", overfetch=1)
+    claim_ids = [doc["metadata"]["claim_id"] for doc, _ in grouped]
+    assert len(claim_ids) == 4 and len(set(claim_ids)) == 4
+    assert claim_ids[0] == "A"
+
+def test_group_by_with_filters_exhausts_corpus(tmp_path):
+    store = make_store(tmp_path)
+    grouped = store.search("claim", k=10, filters={"status": "Denied"}, group_by="claim_id")
+    assert sorted(doc["metadata"]["claim_id"] for doc, _ in grouped) == ["A", "B", "C", "D"]
+
+def reopen(tmp_path, **kwargs):
+    store = VectorStore(index_file=str(tmp_path / "faiss.index"), metadata_file=str(tmp_path / "metadata.pkl"), **kwargs)
+    store.model = HashingEncoder()
+    return store
+
+def test_snapshot_publish_lazy_load_and_rollback(tmp_path):
+    store = make_store(tmp_path)
+    first = store.save_index()
+    store.create_index(store.documents[:5])
+    second = store.save_index()
+    assert second > first
+    assert [m["current"] for m in store.list_snapshots()] == [False, True]
+
+    restarted = reopen(tmp_path)
+    restarted.load_index()
+    # Size comes from the manifest; nothing is read until the first search
+    assert restarted.version == second and restarted.size() == 5
+    assert restarted.index is None
+    assert len(restarted.search("claim", k=10)) == 5
+
+    assert restarted.rollback() == first
+    assert restarted.size() == 14
+    assert len(restarted.search("claim", k=20)) == 14
+    assert reopen(tmp_path).current_version() == first
+
+def test_crash_mid_publish_keeps_previous_snapshot(tmp_path, monkeypatch):
+    import indexing.vector_store as vs
+    store = make_store(tmp_path)
+    first = store.save_index()
+
+    def crash(*args):
+        raise OSError("disk full")
+    monkeypatch.setattr(vs.faiss, "write_index", crash)
+    store.create_index(store.documents[:3])
+    with pytest.raises(OSError):
+        store.save_index()
+
+    restarted = reopen(tmp_path)
+    restarted.load_index(lazy=False)
+    assert restarted.version == first and restarted.size() == 14
+    assert [m["version"] for m in restarted.list_snapshots()] == [first]
+
+def corrupt(tmp_path, version):
+    documents = tmp_path / "snapshots" / version / "documents.pkl"
+    data = bytearray(documents.read_bytes())
+    data[-2] ^= 0xFF
+    documents.write_bytes(bytes(data))
+
+def test_corrupt_snapshot_is_rejected(tmp_path):
+    store = make_store(tmp_path)
+    version = store.save_index()
+    corrupt(tmp_path, version)
+
+    with pytest.raises(SnapshotVerificationError, match="checksum"):
+        reopen(tmp_path).load_index(lazy=False)
+    # A lazily selected snapshot that fails on first search is dropped, not retried forever
+    restarted = reopen(tmp_path)
+    restarted.load_index()
+    with pytest.raises(SnapshotVerificationError):
+        restarted.search("claim")
+    assert restarted.version is None and restarted.size() == 0
+    with pytest.raises(ValueError, match="built with"):
+        reopen(tmp_path, model_name="other-model").load_index()
+
+def test_old_snapshots_are_pruned(tmp_path):
+    store = reopen(tmp_path, keep_snapshots=2)
+    store.create_index([{"id": "A_0", "text": "claim", "metadata": {"claim_id": "A"}}])
+    versions = [store.save_index() for _ in range(4)]
+    assert [m["version"] for m in store.list_snapshots()] == versions[-2:]
+
+@pytest.mark.parametrize("k", [0, -1])
+def test_non_positive_k_returns_nothing(tmp_path, k):
+    store = make_store(tmp_path)
+    assert store.search("claim", k=k) == []
+    assert store.search("claim", k=k, filters={"status": "Denied"}, group_by="claim_id") == []
+
+def test_rollback_onto_corrupt_snapshot_keeps_current(tmp_path):
+    store = make_store(tmp_path)
+    first = store.save_index()
+    store.create_index(store.documents[:5])
+    second = store.save_index()
+    corrupt(tmp_path, first)
+
+    with pytest.raises(SnapshotVerificationError):
+        store.rollback(first)
+    assert store.current_version() == second and store.version == second
+    assert len(store.search("claim", k=20)) == 5
+
+def test_search_during_rollback_sees_one_snapshot(tmp_path):
+    store = reopen(tmp_path)
+    store.create_index([{"id": f"old_{i}", "text": f"claim {i}", "metadata": {"claim_id": f"old{i}"}} for i in range(20)])
+    old = store.save_index()
+    store.create_index([{"id": f"new_{i}", "text": f"claim {i}", "metadata": {"claim_id": f"new{i}"}} for i in range(8)])
+    new = store.save_index()
+
+    stop = threading.Event()
+    def flip():
+        while not stop.is_set():
+            for version in (old, new):
+                store.rollback(version)
+    flipper = threading.Thread(target=flip)
+    flipper.start()
+    try:
+        for _ in range(300):
+            results = store.search("claim", k=20)
+            prefixes = {doc["id"].split("_")[0] for doc, _ in results}
+            assert len(prefixes) == 1
+            assert len(results) == (20 if prefixes == {"old"} else 8)
+    finally:
+        stop.set()
+        flipper.join()
+
+def test_transient_read_error_keeps_snapshot_pending(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    store.save_index()
+    restarted = reopen(tmp_path)
+    restarted.load_index()
+
+    read_snapshot = restarted._read_snapshot
+    calls = []
+    def flaky(manifest):
+        calls.append(manifest["version"])
+        if len(calls) == 1:
+            raise OSError("I/O error")
+        return read_snapshot(manifest)
+    monkeypatch.setattr(restarted, "_read_snapshot", flaky)
+
+    with pytest.raises(OSError):
+        restarted.search("claim")
+    assert restarted.size() == 14
+    assert len(restarted.search("claim", k=20)) == 14